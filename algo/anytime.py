@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Anytime search (ARA*) over robot poses, for planning against a deadline
+"""
+import heapq
+import time
+
+from algo.constants import NORTH, EAST, SOUTH, WEST, FORWARD_COST, TURN_COST
+from algo import statespace
+
+INF = float('inf')
+
+
+class AnytimeAStar:
+
+    """
+    Anytime repairing A* over (row, col, heading) with the costs of statespace.
+
+    The first search inflates the heuristic by epsilon and finds a path quickly. Each
+    following search lowers epsilon by step, reusing the work of the previous one, until
+    epsilon reaches 1 (an optimal path) or the deadline passes. The best path found so far
+    is always returned, together with a bound on how far its cost can be from the optimum.
+
+    Attributes:
+        traversable: TraversableMap
+            The traversability layer the search runs on
+        epsilon: float
+            Inflation of the heuristic for the first search
+        step: float
+            Decrease of the inflation between searches
+        bound: float
+            Suboptimality bound reached by the last search: the cost of the path returned
+            is at most bound times the optimal cost
+        expanded: int
+            Number of poses expanded by the last search, over all its iterations
+        iterations: int
+            Number of searches the last search completed
+    """
+
+    def __init__(self, traversable, epsilon=2.5, step=0.5, forward_cost=FORWARD_COST, turn_cost=TURN_COST):
+        self.traversable = traversable
+        self.epsilon = epsilon
+        self.step = step
+        self.forward_cost = forward_cost
+        self.turn_cost = turn_cost
+        self.bound = INF
+        self.expanded = 0
+        self.iterations = 0
+
+    def search(self, start, direction, goal, deadline=None):
+        """
+        Path from the start pose to any heading at the goal cell
+
+        Args:
+            deadline: float, optional
+                time.time() after which no further improvement is attempted. The first path
+                is always completed, even past the deadline
+
+        Returns:
+            List of (row, col, heading) from start to goal
+
+        Raises:
+            ValueError if the goal cannot be reached
+        """
+        goal = (int(goal[0]), int(goal[1]))
+        start = (int(start[0]), int(start[1]), direction)
+        goal_states = [(goal[0], goal[1], d) for d in (NORTH, EAST, SOUTH, WEST)]
+
+        def h(state):
+            return statespace.heuristic(state[:2], state[2], goal, self.forward_cost, self.turn_cost)
+
+        g = {start: 0}
+        parent = {start: None}
+        # poses to expand with the g they were queued with, and the ones improved after expansion
+        opened = {start: 0}
+        incons = dict()
+        best = None
+        epsilon = max(self.epsilon, 1.0)
+        self.bound = INF
+        self.expanded = 0
+        self.iterations = 0
+        while True:
+            frontier = [(g_ + epsilon * h(state), -g_, state) for state, g_ in opened.items()]
+            heapq.heapify(frontier)
+            closed = set()
+            # best goal pose so far, possibly settled by an earlier search
+            reached = min((state for state in goal_states if state in g),
+                          key=lambda state: g[state], default=None)
+            interrupted = False
+            while frontier:
+                f, neg_g, state = frontier[0]
+                if opened.get(state) != -neg_g:
+                    heapq.heappop(frontier)
+                    continue
+                if reached is not None and g[reached] <= f:
+                    break
+                if best is not None and deadline is not None and time.time() > deadline:
+                    interrupted = True
+                    break
+                heapq.heappop(frontier)
+                del opened[state]
+                closed.add(state)
+                self.expanded += 1
+                if state[:2] == goal and (reached is None or g[state] < g[reached]):
+                    reached = state
+                for nxt, cost, _ in statespace.successors(
+                        self.traversable, state, self.forward_cost, self.turn_cost):
+                    new_g = g[state] + cost
+                    if new_g < g.get(nxt, INF):
+                        g[nxt] = new_g
+                        parent[nxt] = state
+                        if nxt in closed:
+                            incons[nxt] = new_g
+                        else:
+                            opened[nxt] = new_g
+                            heapq.heappush(frontier, (new_g + epsilon * h(nxt), -new_g, nxt))
+                        if nxt[:2] == goal and (reached is None or new_g < g[reached]):
+                            reached = nxt
+            if interrupted:
+                return best
+            if reached is None:
+                if best is None:
+                    raise ValueError('No Path Found')
+                return best
+            best = statespace.trace(parent, reached)
+            self.iterations += 1
+            # every pose of an optimal path not yet settled is open or inconsistent
+            pending = [g[state] + h(state) for state in list(opened) + list(incons)]
+            lower = min(pending) if pending else g[reached]
+            self.bound = 1.0 if epsilon <= 1.0 or lower <= 0 else max(1.0, min(epsilon, g[reached] / lower))
+            if self.bound <= 1.0 or (deadline is not None and time.time() > deadline):
+                return best
+            epsilon = max(epsilon - self.step, 1.0)
+            opened.update(incons)
+            incons = dict()
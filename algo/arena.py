@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Seeded generation of valid arenas, for benchmarks and test corpora
+"""
+import os
+import numpy as np
+
+from algo.constants import MAX_ROWS, MAX_COLS
+from algo.mapmethod import file_from_map, start_of, goal_of
+from algo.traversable import TraversableMap, flood
+
+# obstacle pieces as (row, col) offsets of their cells
+SHAPES = {
+    'block': ((0, 0),),
+    'bar2': ((0, 0), (0, 1)),
+    'bar3': ((0, 0), (0, 1), (0, 2)),
+    'bar4': ((0, 0), (0, 1), (0, 2), (0, 3)),
+    'square': ((0, 0), (0, 1), (1, 0), (1, 1)),
+    'corner': ((0, 0), (0, 1), (0, 2), (1, 0), (2, 0)),
+}
+# every shape equally likely
+UNIFORM = {name: 1 for name in SHAPES}
+
+
+def _orientations(offsets):
+    # the piece and its three quarter turns, moved back to non-negative offsets
+    orientations = []
+    cells = np.array(offsets)
+    for _ in range(4):
+        orientations.append(cells - cells.min(axis=0))
+        cells = np.stack([cells[:, 1], -cells[:, 0]], axis=1)
+    return orientations
+
+
+ORIENTATIONS = {name: _orientations(offsets) for name, offsets in SHAPES.items()}
+
+
+def reachable(arena, start, goal):
+    """
+    Check if the robot can drive from start to goal, by flooding the traversability
+    mask from start (the robot can turn on the spot wherever it stands)
+    """
+    mask = TraversableMap.compute_mask(arena)
+    return bool(mask[tuple(goal)] and flood(mask, start)[tuple(goal)])
+
+
+def generate(rows=MAX_ROWS, cols=MAX_COLS, density=0.1, shapes=UNIFORM, seed=None, attempts=100):
+    """
+    Arena of obstacle pieces scattered at random, with clear start and goal zones and a goal
+    the robot can reach
+
+    Args:
+        density: float
+            Fraction of the cells the pieces drawn cover, pieces overlapping and the cleared
+            zones leave the arena somewhat sparser
+        shapes: dict
+            Relative frequency of each piece of SHAPES, turned at random
+        seed: int or np.random.Generator, optional
+            The same seed always gives the same arena
+        attempts: int
+            Arenas drawn before giving up on one with a reachable goal
+
+    Returns:
+        np array of the arena (1 free, 2 obstacle)
+
+    Raises:
+        ValueError if no arena drawn has a reachable goal
+    """
+    rng = np.random.default_rng(seed)
+    names = [name for name in shapes if shapes[name] > 0]
+    weights = np.array([shapes[name] for name in names], dtype=float)
+    weights /= weights.sum()
+    mean_size = sum(w * len(SHAPES[name]) for name, w in zip(names, weights))
+    count = int(round(density * rows * cols / mean_size))
+    start, goal = start_of((rows, cols)), goal_of((rows, cols))
+    for _ in range(attempts):
+        arena = np.ones((rows, cols), dtype=int)
+        kinds = rng.choice(len(names), count, p=weights)
+        turns = rng.integers(0, 4, count)
+        corners = rng.integers(0, [rows, cols], (count, 2))
+        for kind, name in enumerate(names):
+            for turn in range(4):
+                picked = corners[(kinds == kind) & (turns == turn)]
+                if len(picked) == 0:
+                    continue
+                cells = (picked[:, None] + ORIENTATIONS[name][turn][None]).reshape(-1, 2)
+                inside = (cells[:, 0] < rows) & (cells[:, 1] < cols)
+                arena[cells[inside, 0], cells[inside, 1]] = 2
+        # 3x3 start and goal zones
+        arena[-3:, :3] = 1
+        arena[:3, -3:] = 1
+        if reachable(arena, start, goal):
+            return arena
+    raise ValueError('No arena with a reachable goal in {} attempts'.format(attempts))
+
+
+def corpus(directory, count, seed=0, **options):
+    """
+    Write count arenas to directory, in the format map_from_file reads. Arena i is
+    generated from the seed (seed, i), so any of them can be made again on its own
+
+    Args:
+        options:
+            Keyword arguments of generate
+
+    Returns:
+        List of the paths written
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, 'arena_{}_{}.txt'.format(seed, i))
+        file_from_map(generate(seed=[seed, i], **options), path)
+        paths.append(path)
+    return paths
@@ -14,6 +14,26 @@ LEFT = "L"
 RIGHT = "R"
 FORWARD = "F"
 
+# MOVEMENT COSTS
+FORWARD_COST = 1
+TURN_COST = 1
+
+# PLANNER MODES
+PLAN_CELL = 'cell'
+PLAN_HEADING = 'heading'
+PLAN_FIELD = 'field'
+PLAN_HIERARCHICAL = 'hierarchical'
+PLAN_JPS = 'jps'
+PLAN_ANYTIME = 'anytime'
+PLAN_TIMED = 'timed'
+PLAN_BIDIRECTIONAL = 'bidirectional'
+PLAN_MODES = (PLAN_CELL, PLAN_HEADING, PLAN_FIELD, PLAN_HIERARCHICAL, PLAN_JPS, PLAN_ANYTIME, PLAN_TIMED,
+              PLAN_BIDIRECTIONAL)
+
+# EXPLORATION STRATEGIES (after the first wall-following lap)
+EXPLORE_NEIGHBOURS = 'neighbours'
+EXPLORE_FRONTIER = 'frontier'
+
 # MAP CONSTANTS
 MAX_ROWS = 20
 MAX_COLS = 15
@@ -25,6 +45,7 @@ TOP_RIGHT_CORNER = GOAL
 TOP_LEFT_CORNER = np.asarray([1, 1])
 SIMU_MAP_FILE = './map/finalmap.txt'
 REAL_MAP_FILE = './map/currentmap.txt'
+MOTION_PROFILE_FILE = './map/profile.json'
 
 # SOCKET CONNECTION
 SERVER = "192.168.103.26"
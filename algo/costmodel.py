@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Wall-clock cost of robot movements and the time-optimal search over robot poses
+"""
+import heapq
+import json
+
+from algo.constants import NORTH, EAST, SOUTH, WEST, FORWARD
+from algo import statespace
+
+
+class MotionProfile:
+
+    """
+    Predicted time taken by the robot to execute movements.
+
+    Consecutive forwards are sent as a single run ('F5'), which the robot drives without
+    stopping, so a run costs a fixed start (accelerating and braking) plus a time per cell.
+
+    Attributes:
+        turn_time: float
+            Seconds for a 90 degree turn
+        cell_time: float
+            Seconds per cell moved within a run
+        run_time: float
+            Seconds added once per run of forwards
+    """
+
+    def __init__(self, turn_time=1.0, cell_time=0.3, run_time=0.5):
+        self.turn_time = turn_time
+        self.cell_time = cell_time
+        self.run_time = run_time
+
+    @classmethod
+    def load(cls, path):
+        """
+        Profile measured on the robot, from a JSON file with the attributes as keys
+        """
+        with open(path) as f:
+            return cls(**json.load(f))
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(vars(self), f, indent=4)
+
+    def predict(self, movements):
+        """
+        Predicted seconds to execute the movements
+        """
+        seconds = 0
+        running = False
+        for move in movements:
+            if move == FORWARD:
+                seconds += self.cell_time if running else self.run_time + self.cell_time
+                running = True
+            else:
+                seconds += self.turn_time
+                running = False
+        return seconds
+
+    def heuristic(self, state, goal):
+        """
+        Admissible estimate of the seconds from (row, col, heading, running) to goal:
+        the cells and turns left, and a run for every heading that still has to be driven
+        """
+        r, c, d, running = state
+        dr, dc = goal[0] - r, goal[1] - c
+        need = [h for h, delta in ((SOUTH, dr), (NORTH, -dr), (EAST, dc), (WEST, -dc)) if delta > 0]
+        runs = len(need) - (1 if running and d in need else 0)
+        return (self.cell_time * (abs(dr) + abs(dc)) + self.run_time * runs +
+                self.turn_time * statespace.turns_needed((r, c), d, goal))
+
+
+def astar(traversable, start, direction, goal, profile):
+    """
+    Time-optimal path over (row, col, heading), searching (row, col, heading, running)
+    where running tells if the last movement was a forward
+
+    Returns:
+        (states, expanded, seconds): the list of (row, col, heading) from start to goal,
+        the number of expanded states and the predicted seconds
+
+    Raises:
+        ValueError if the goal cannot be reached
+    """
+    goal = (int(goal[0]), int(goal[1]))
+    start = (int(start[0]), int(start[1]), direction, False)
+    g = {start: 0}
+    parent = {start: None}
+    closed = set()
+    counter = 0
+    frontier = [(profile.heuristic(start, goal), counter, start)]
+    while frontier:
+        _, _, state = heapq.heappop(frontier)
+        if state in closed:
+            continue
+        if state[:2] == goal:
+            states = [s[:3] for s in statespace.trace(parent, state)]
+            return states, len(closed), g[state]
+        closed.add(state)
+        r, c, d, running = state
+        for nxt, _, move in statespace.successors(traversable, (r, c, d)):
+            if move == FORWARD:
+                nxt = nxt + (True,)
+                cost = profile.cell_time if running else profile.run_time + profile.cell_time
+            else:
+                nxt = nxt + (False,)
+                cost = profile.turn_time
+            new_g = g[state] + cost
+            if nxt not in closed and new_g < g.get(nxt, float('inf')):
+                g[nxt] = new_g
+                parent[nxt] = state
+                counter += 1
+                heapq.heappush(frontier, (new_g + profile.heuristic(nxt, goal), counter, nxt))
+    raise ValueError('No Path Found')
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""Goal-rooted distance fields over robot poses
+"""
+import heapq
+import numpy as np
+
+from algo.constants import NORTH, EAST, SOUTH, WEST, FORWARD_COST, TURN_COST
+from algo import statespace
+
+
+class DistanceField:
+
+    """
+    Cost from every pose (row, col, heading) to a target cell, computed once by a reverse
+    search and answered afterwards by lookup.
+
+    Attributes:
+        traversable: TraversableMap
+            The traversability layer the field is computed on
+        target: tuple
+            (row, col) of the target cell, reached with any heading
+        dist: np array
+            dist[r, c, heading-1] is the cost to the target, inf if unreachable
+        depends: np array of bool
+            Cells whose traversability was read while building the field. Changes
+            anywhere else cannot affect it
+        mask: np array of bool
+            The traversability mask the field was built from
+        version: int
+            The traversable version the field is known to be valid for
+    """
+
+    def __init__(self, traversable, target, forward_cost=FORWARD_COST, turn_cost=TURN_COST):
+        self.traversable = traversable
+        self.target = (int(target[0]), int(target[1]))
+        self.forward_cost = forward_cost
+        self.turn_cost = turn_cost
+        self.build()
+
+    def build(self):
+        """
+        Reverse Dijkstra from the target over (row, col, heading)
+        """
+        traversable = self.traversable
+        rows, cols = traversable.shape
+        self.dist = np.full((rows, cols, 4), np.inf)
+        self.depends = np.zeros((rows, cols), dtype=bool)
+        self.mask = traversable.mask.copy()
+        self.version = traversable.version
+        r, c = self.target
+        if not (0 <= r < rows and 0 <= c < cols):
+            return
+        self.depends[r, c] = True
+        if not traversable.check_valid(self.target):
+            return
+        dist = dict()
+        frontier = []
+        for d in (NORTH, EAST, SOUTH, WEST):
+            dist[(r, c, d)] = 0
+            frontier.append((0, (r, c, d)))
+        closed = set()
+        while frontier:
+            cost, state = heapq.heappop(frontier)
+            if state in closed:
+                continue
+            closed.add(state)
+            self.dist[state[0], state[1], state[2]-1] = cost
+            for prev, step in self.predecessors(state):
+                new_cost = cost + step
+                if new_cost < dist.get(prev, np.inf):
+                    dist[prev] = new_cost
+                    heapq.heappush(frontier, (new_cost, prev))
+
+    def predecessors(self, state):
+        """
+        Poses from which a single movement leads to state
+
+        Returns:
+            List of (state, cost)
+        """
+        r, c, d = state
+        prevs = [((r, c, statespace.turn_right(d)), self.turn_cost),
+                 ((r, c, statespace.turn_left(d)), self.turn_cost)]
+        dr, dc = statespace.DELTA[d]
+        pr, pc = r-dr, c-dc
+        rows, cols = self.depends.shape
+        if 0 <= pr < rows and 0 <= pc < cols:
+            self.depends[pr, pc] = True
+            if self.traversable.mask[pr, pc]:
+                prevs.append(((pr, pc, d), self.forward_cost))
+        return prevs
+
+    def valid(self):
+        """
+        Check if the field still holds for the current traversability mask.
+        A changed mask only invalidates the field if one of the cells it depends on changed.
+        """
+        if self.version == self.traversable.version:
+            return True
+        if np.any((self.traversable.mask != self.mask) & self.depends):
+            return False
+        self.mask = self.traversable.mask.copy()
+        self.version = self.traversable.version
+        return True
+
+    def cost_from(self, coord, direction):
+        """
+        Cost from the pose to the target, inf if unreachable
+        """
+        return self.dist[coord[0], coord[1], direction-1]
+
+    def path_from(self, coord, direction):
+        """
+        Follow the field downhill from the pose to the target
+
+        Returns:
+            List of (row, col, heading) from the pose to the target
+
+        Raises:
+            ValueError if the target cannot be reached
+        """
+        state = (int(coord[0]), int(coord[1]), direction)
+        cost = self.cost_from(state[:2], direction)
+        if np.isinf(cost):
+            raise ValueError('No Path Found')
+        states = [state]
+        while state[:2] != self.target:
+            # prefer moving forward over turning when both are optimal
+            for nxt, step, _ in reversed(statespace.successors(
+                    self.traversable, state, self.forward_cost, self.turn_cost)):
+                if self.dist[nxt[0], nxt[1], nxt[2]-1] + step <= cost + 1e-9:
+                    break
+            state, cost = nxt, cost - step
+            states.append(state)
+        return states
+
+
+def distance_field(traversable, target):
+    """
+    The distance field to target on the traversability layer, rebuilt only when
+    a cell it depends on has changed.
+    """
+    target = (int(target[0]), int(target[1]))
+    field = traversable.fields.get(target)
+    if field is None or not field.valid():
+        field = DistanceField(traversable, target)
+        traversable.fields[target] = field
+    return field
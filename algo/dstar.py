@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""Incremental replanning (D* Lite) over robot poses for a map that changes while the robot moves
+"""
+import heapq
+import numpy as np
+
+from algo.constants import NORTH, EAST, SOUTH, WEST, FORWARD_COST, TURN_COST
+from algo import statespace
+
+INF = float('inf')
+
+
+class DStarLite:
+
+    """
+    D* Lite search from one or more goals back to the robot pose over (row, col, heading).
+    With several goals the planner leads to the cheapest reachable one.
+
+    The search state is kept between calls to plan(). When the traversability mask changes,
+    only the poses around the flipped cells are updated and the search is repaired instead of
+    being rebuilt, so re-planning after a few newly sensed cells is cheap.
+
+    Attributes:
+        traversable: TraversableMap
+            The traversability layer the planner follows
+        goals: set
+            Goal poses (row, col, heading). A goal given as a cell contributes all four headings
+        g, rhs: dict
+            Cost-to-goal estimates keyed by (row, col, heading), missing means inf
+        open: dict
+            Key of every pose currently in the priority queue
+        mask: np array of bool
+            The traversability mask the search state is consistent with
+        expanded: int
+            Number of poses expanded by the last plan()
+    """
+
+    def __init__(self, traversable, goals, forward_cost=FORWARD_COST, turn_cost=TURN_COST):
+        """
+        Constructor
+
+        Args:
+            traversable: TraversableMap
+            goals: List
+                Goals, either (row, col) reached with any heading or (row, col, heading)
+        """
+        self.traversable = traversable
+        self.forward_cost = forward_cost
+        self.turn_cost = turn_cost
+        self.g = dict()
+        self.rhs = dict()
+        self.open = dict()
+        self.queue = []
+        self.km = 0
+        self.last = None
+        self.mask = traversable.mask.copy()
+        self.expanded = 0
+        self.goals = set()
+        for goal in goals:
+            for goal_state in self.goal_states(goal):
+                self.goals.add(goal_state)
+                self.rhs[goal_state] = 0
+                self.push(goal_state, (self.h(goal_state), 0))
+
+    @staticmethod
+    def goal_states(goal):
+        if len(goal) == 3:
+            return [tuple(int(x) for x in goal)]
+        return [(int(goal[0]), int(goal[1]), d) for d in (NORTH, EAST, SOUTH, WEST)]
+
+    def remove_goal(self, goal):
+        """
+        Stop treating goal as a goal, repairing the search on the next plan()
+        """
+        for goal_state in self.goal_states(goal):
+            if goal_state in self.goals:
+                self.goals.remove(goal_state)
+                self.update_vertex(goal_state)
+
+    def h(self, state):
+        """
+        Consistent lower bound on the cost between the robot pose and state
+        """
+        if self.last is None:
+            return 0
+        return self.forward_cost * (abs(self.last[0] - state[0]) + abs(self.last[1] - state[1]))
+
+    def key(self, state):
+        best = min(self.g.get(state, INF), self.rhs.get(state, INF))
+        return (best + self.h(state) + self.km, best)
+
+    def push(self, state, key):
+        self.open[state] = key
+        heapq.heappush(self.queue, (key, state))
+
+    def top(self):
+        """
+        Smallest key in the queue, skipping stale entries
+        """
+        while self.queue:
+            key, state = self.queue[0]
+            if self.open.get(state) == key:
+                return key, state
+            heapq.heappop(self.queue)
+        return (INF, INF), None
+
+    def valid(self, coord):
+        r, c = coord
+        rows, cols = self.mask.shape
+        return 0 <= r < rows and 0 <= c < cols and bool(self.mask[r, c])
+
+    def successors(self, state):
+        r, c, d = state
+        nexts = [((r, c, statespace.turn_left(d)), self.turn_cost),
+                 ((r, c, statespace.turn_right(d)), self.turn_cost)]
+        dr, dc = statespace.DELTA[d]
+        if self.valid((r, c)) and self.valid((r+dr, c+dc)):
+            nexts.append(((r+dr, c+dc, d), self.forward_cost))
+        return nexts
+
+    def predecessors(self, state):
+        r, c, d = state
+        prevs = [(r, c, statespace.turn_right(d)), (r, c, statespace.turn_left(d))]
+        dr, dc = statespace.DELTA[d]
+        if self.valid((r, c)) and self.valid((r-dr, c-dc)):
+            prevs.append((r-dr, c-dc, d))
+        return prevs
+
+    def update_vertex(self, state):
+        if state not in self.goals:
+            self.rhs[state] = min(cost + self.g.get(nxt, INF)
+                                  for nxt, cost in self.successors(state))
+        self.open.pop(state, None)
+        if self.g.get(state, INF) != self.rhs.get(state, INF):
+            self.push(state, self.key(state))
+
+    def compute_shortest_path(self, start):
+        self.expanded = 0
+        while True:
+            key, state = self.top()
+            if state is None:
+                return
+            if key >= self.key(start) and self.rhs.get(start, INF) == self.g.get(start, INF):
+                return
+            self.expanded += 1
+            new_key = self.key(state)
+            if key < new_key:
+                self.push(state, new_key)
+                continue
+            heapq.heappop(self.queue)
+            del self.open[state]
+            if self.g.get(state, INF) > self.rhs.get(state, INF):
+                self.g[state] = self.rhs[state]
+                for prev in self.predecessors(state):
+                    self.update_vertex(prev)
+            else:
+                self.g[state] = INF
+                self.update_vertex(state)
+                for prev in self.predecessors(state):
+                    self.update_vertex(prev)
+
+    def sync(self):
+        """
+        Apply the traversability changes since the last plan() to the search state
+        """
+        flipped = np.flatnonzero(self.mask != self.traversable.mask)
+        if flipped.size == 0:
+            return
+        # poses whose forward edge into or out of a flipped cell may have changed
+        cols = self.mask.shape[1]
+        affected = set()
+        for idx in flipped.tolist():
+            r, c = divmod(idx, cols)
+            for d in (NORTH, EAST, SOUTH, WEST):
+                dr, dc = statespace.DELTA[d]
+                affected.add((r, c, d))
+                affected.add((r-dr, c-dc, d))
+        self.mask = self.traversable.mask.copy()
+        for state in affected:
+            self.update_vertex(state)
+
+    def plan(self, start, direction):
+        """
+        Cheapest path from the pose to a goal, repairing the previous search
+
+        Returns:
+            List of (row, col, heading) from the pose to the goal it reaches
+
+        Raises:
+            ValueError if no goal can be reached
+        """
+        start = (int(start[0]), int(start[1]), direction)
+        if self.last is not None:
+            self.km += self.h(start)
+        self.last = start
+        self.sync()
+        self.compute_shortest_path(start)
+        if self.g.get(start, INF) == INF:
+            raise ValueError('No Path Found')
+        states = [start]
+        state = start
+        while state not in self.goals:
+            # prefer moving forward over turning when both are optimal
+            state = min(reversed(self.successors(state)),
+                        key=lambda x: x[1] + self.g.get(x[0], INF))[0]
+            states.append(state)
+            if len(states) > len(self.g) + 1:
+                raise ValueError('No Path Found')
+        return states
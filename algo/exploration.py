@@ -1,10 +1,18 @@
 #!/usr/bin/env python3
 import numpy as np
-import time
 from algo.constants import *
-from algo.fastest import FastestPath
-import copy
-import generate
+from algo.mapmethod import start_of
+from algo.dstar import DStarLite
+from algo import costmodel
+from algo.costmodel import MotionProfile
+from algo.distfield import distance_field
+from algo.geometry import SIDES
+from algo.movement import advance
+from algo.sensing import information_gain
+from algo import statespace
+
+# seconds between the end of exploration and the robot leaving for the start zone
+RETURN_PAUSE = 0.5
 
 
 class Exploration:
@@ -16,54 +24,151 @@ class Exploration:
 
     """
 
-    def __init__(self, robot, time_limit=None, coverage=None, simulation=True):
+    def __init__(self, robot, time_limit=None, coverage=None, simulation=True, profile=None,
+                 strategy=EXPLORE_NEIGHBOURS, overhead=0.0, return_overhead=None, verbose=True):
         """
         Constructor
 
         Args:
             time_limit: float
-            Maximum time allowed for exploration, in seconds
+            Maximum time allowed for exploration and the return to the start zone, in seconds.
+            Exploration goes on as long as the predicted return still fits in what is left
+
+            profile: MotionProfile, optional
+            Time taken by the robot for its movements. If given, the return leg to the
+            start zone minimises the predicted seconds instead of the movements. The default
+            profile is used to predict the return otherwise
 
             simulation:  boolean, optional 
             To tell the class if the mode is simulation or real
+
+            strategy: str, optional
+            How to explore what the first lap missed. EXPLORE_NEIGHBOURS visits the cells around
+            the first unknown cell in turn, EXPLORE_FRONTIER drives to the pose whose sensors reach
+            the most unknown cells per unit of travel
+
+            overhead: float, optional
+            Seconds each exploration movement takes besides its motion (messages, sensing,
+            deciding the next one), reserved along with its predicted motion
+
+            return_overhead: float, optional
+            Seconds the return to the start zone takes besides its motion and pause (messages,
+            planning it), reserved along with its predicted motion. Three messages of the
+            robot's latency if None
+
+            verbose: boolean, optional
+            To print the progress of exploration (coverage reached, end of the first round,
+            map and pose when the time is over). Headless callers turn it off
         """
+        if strategy not in (EXPLORE_NEIGHBOURS, EXPLORE_FRONTIER):
+            raise ValueError('Unknown exploration strategy: {}'.format(strategy))
         self.robot = robot
         self.time_limit = time_limit
         self.coverage = coverage
         self.simulation = simulation
-        self.virtual_wall = [0, 0, MAX_ROWS, MAX_COLS]
+        self.profile = profile
+        # predicts the seconds of the return to the start zone
+        self.timing = profile if profile is not None else MotionProfile()
+        self.overhead = overhead
+        # the end of exploration and the movements sent, and the reply
+        self.return_overhead = return_overhead if return_overhead is not None else 3 * robot.latency
+        self.strategy = strategy
+        self.verbose = verbose
+        # the time of the robot, virtual in a headless simulation
+        self.clock = robot.clock
+        rows, cols = robot.current_map.shape
+        self.geometry = robot.geometry
+        # centre of the start zone of this arena
+        self.start_zone = start_of((rows, cols))
         self.one_round_completed = False
+        # the map as of the last step yielded
+        self.known = np.zeros_like(robot.current_map)
 
     def start(self):
         """
-        Starting point of right wall follower explore
-        trajectory: str
-            for debugging only
+        Starting point of right wall follower explore, followed by the return to the start zone
+        """
+        end_time = self.clock.time() + self.time_limit if self.time_limit else None
+        if not self.drive(self.steps(end_time)):
+            return
+        np.savetxt('map/currentmap.txt',
+                   self.robot.current_map, '%d', delimiter='')
+        # update current map
+
+        self.robot.send('E')
+        self.clock.sleep(RETURN_PAUSE)
+        # return to the start zone after exploration
+        movements = self.return_movements()
+        if(len(movements) == 0):
+            self.robot.send('S')
+        else:
+            self.robot.send(movements)
+        for move in movements:
+            self.robot.execute_nosend(move)
+            if self.robot.update_frontend:
+                self.robot.update_frontend(
+                    self.robot.current_map, self.robot.center, self.robot.cal_head())
+
+        self.robot.receive()
+        if self.robot.direction != WEST:
+            calibrate_movement = self.robot.correct_direction(WEST)
+            for move in calibrate_movement:
+                self.robot.execute(move)
+                if self.robot.update_frontend:
+                    self.robot.update_frontend(
+                        self.robot.current_map, self.robot.center, self.robot.cal_head())
+        self.clock.sleep(5)
+        # MDF_string = generate.MDFString()
+        # self.robot.send('Z'+MDF_string)
+        self.robot.send('C')
+
+    def steps(self, end_time=None):
         """
-        start_time = time.time()
-        if self.time_limit:
-            end_time = start_time + self.time_limit
+        Exploration as a generator, explore until the map is known, or until the time left
+        is just enough to return to the start zone. Free of robot I/O, so the caller drives
+        the robot at its own pace.
 
+        Each movement decided is yielded as (movement, changed), changed being the (row, col)
+        of the map cells that changed since the previous step. The caller makes the robot
+        execute it and resumes the generator either
+            - with next(), once the robot pose and map are updated (robot.execute and
+              robot.update_map, as drive() does), or
+            - with send(readings), the number of free cells seen by each of the six sensors
+              after the movement, which are applied to the robot pose and map here
+
+        Args:
+            end_time: float, optional
+                clock.time() by which the robot must be back in the start zone
+
+        Returns:
+            False if the coverage is reached, True when the robot should return to the start zone
+        """
+        start_time = self.clock.time()
         trajectory = ''
         # the first round
         while not (self.check_completed() or self.one_round_completed):
-            trajectory += self.move()
-            if self.time_limit:
-                if time.time() > end_time:
-                    print('Time is over.')
-                    print(trajectory)
-                    print('Time used: {:.2f}'.format(time.time() - start_time))
-                    return
+            move = yield from self.follow_wall(end_time)
+            if move is None:
+                self.time_over(start_time, trajectory)
+                return True
+            trajectory += move
             if self.coverage:
                 actual_coverage = self.robot.compute_coverage()
                 if actual_coverage >= self.coverage:
-                    print('Coverage: {:.2f}'.format(actual_coverage))
-                    return
+                    self.log('Coverage: {:.2f}'.format(actual_coverage))
+                    return False
         # complete one round but not explored fully
+        if self.strategy == EXPLORE_FRONTIER:
+            return (yield from self.explore_frontiers(start_time, end_time))
+        # unknown cells no candidate around led to sensing
+        given_up = np.zeros(self.robot.current_map.shape, dtype=bool)
         while not self.check_completed():
             # unexplored block
-            unexplored = np.argwhere(self.robot.current_map == 0)
+            unexplored = np.argwhere((self.robot.current_map == 0) & ~given_up)
+            if len(unexplored) == 0:
+                break
             r, c = unexplored[0, 0], unexplored[0, 1]
+            self.robot.traversable.refresh()
             # get the neighbours of it
             neighour_layer1 = []
             for i in [-2, 2]:
@@ -80,129 +185,246 @@ class Exploration:
             neighour_layer3 = [(r+1, c-5), (r-5, c-1), (r-1, c+5), (r+5, c+1)]
             neighour_layer3 = [
                 coord for coord in neighour_layer3 if self.check_valid(coord)]
-            # try to explore this block
+            # try to explore this block, heading for the nearest remaining candidate each time
+            planner = DStarLite(self.robot.traversable,
+                                neighour_layer1 + neighour_layer2)
             exit_condition_1 = False
-            for n in neighour_layer1 + neighour_layer2:
-                if exit_condition_1:
+            while not exit_condition_1:
+                goal, movements = self.plan_nearest(planner)
+                if goal is None:
                     break
-                try:
-                    fsp = FastestPath(self.robot.current_map, self.robot.center, np.asarray(
-                        n), self.robot.direction)
-                    fsp.run()
-                    movements = fsp.movements
-                    for move in movements:
-                        self.robot.execute(move)
-                        self.robot.update_map()
+                planner.remove_goal(goal[:2])
+                for move in movements:
+                    if not (yield from self.step(move, end_time)):
+                        self.time_over(start_time, trajectory)
+                        return True
+                    if self.coverage:
+                        actual_coverage = self.robot.compute_coverage()
+                        if actual_coverage >= self.coverage:
+                            self.log('Coverage: {:.2f}'.format(
+                                actual_coverage))
+                            return False
+                    if self.robot.current_map[r][c] != 0:
+                        exit_condition_1 = True
+                        break
+            if self.robot.current_map[r][c] == 0:
+                planner = DStarLite(self.robot.traversable, neighour_layer3)
+                exit_condition_2 = False
+                while not exit_condition_2:
+                    goal, movements = self.plan_nearest(planner)
+                    if goal is None:
+                        break
+                    planner.remove_goal(goal[:2])
+                    for move in movements + [LEFT, LEFT, LEFT]:
+                        if not (yield from self.step(move, end_time)):
+                            self.time_over(start_time, trajectory)
+                            return True
                         if self.coverage:
                             actual_coverage = self.robot.compute_coverage()
                             if actual_coverage >= self.coverage:
-                                print('Coverage: {:.2f}'.format(
+                                self.log('Coverage: {:.2f}'.format(
                                     actual_coverage))
-                                return
+                                return False
                         if self.robot.current_map[r][c] != 0:
-                            exit_condition_1 = True
+                            exit_condition_2 = True
                             break
-                        if self.time_limit:
-                            if time.time() > end_time:
-                                print('Time is over.')
-                                print('Time used: {:.2f}'.format(
-                                    time.time() - start_time))
-                                print(trajectory)
-                                print(fsp.map_)
-                                print(self.robot.center)
-                                return
-                except:
-                    continue
             if self.robot.current_map[r][c] == 0:
-                exit_condition_2 = False
-                for n in neighour_layer3:
-                    if exit_condition_2:
-                        break
-                    try:
-                        fsp = FastestPath(self.robot.current_map, self.robot.center, np.asarray(
-                            n), self.robot.direction)
-                        fsp.run()
-                        movements = fsp.movements + [LEFT, LEFT, LEFT]
-                        for move in movements:
-                            self.robot.execute(move)
-                            self.robot.update_map()
-                            if self.coverage:
-                                actual_coverage = self.robot.compute_coverage()
-                                if actual_coverage >= self.coverage:
-                                    print('Coverage: {:.2f}'.format(
-                                        actual_coverage))
-                                    return
-                            if self.robot.current_map[r][c] != 0:
-                                exit_condition_2 = True
-                                break
-                            if self.time_limit:
-                                if time.time() > end_time:
-                                    print('Time is over.')
-                                    print('Time used: {:.2f}'.format(
-                                        time.time() - start_time))
-                                    print(trajectory)
-                                    print(fsp.map_)
-                                    print(self.robot.center)
-                                    return
-                    except:
-                        continue
-            if self.time_limit:
-                if time.time() > end_time:
-                    print('Time is over.')
-                    print('Time used: {:.2f}'.format(time.time() - start_time))
-                    print(trajectory)
-                    print(fsp.map_)
-                    print(self.robot.center)
-                    return
+                given_up[r, c] = True
+            # a pass without any movement does not go through step()
+            if end_time is not None and self.clock.time() + self.return_seconds() > end_time:
+                self.time_over(start_time, trajectory)
+                return True
         # print(self.robot.current_map)
-        print('Congrats! Exploration done.')
-        np.savetxt('map/currentmap.txt',
-                   self.robot.current_map, '%d', delimiter='')
-        # update current map
+        self.log('Congrats! Exploration done.')
+        return True
 
-        self.robot.send('E')
-        time.sleep(0.5)
-        # return to the start zone after exploration
-        fsp = FastestPath(self.robot.current_map,
-                          self.robot.center, START, self.robot.direction)
-        fsp.run()
-        movements = fsp.movements
-        if(len(movements) == 0):
-            self.robot.send('S')
-        else:
-            self.robot.send(movements)
-        for move in movements:
+    def time_over(self, start_time, trajectory=''):
+        self.log('Time is over.')
+        self.log('Time used: {:.2f}'.format(self.clock.time() - start_time))
+        self.log(trajectory)
+        self.log(self.robot.current_map)
+        self.log(self.robot.center)
+
+    def log(self, *args):
+        """
+        Print the progress of exploration, if verbose
+        """
+        if self.verbose:
+            print(*args)
+
+    def step(self, move, end_time=None):
+        """
+        Yield a movement to execute, see steps(), unless the robot could no longer return
+        to the start zone by end_time after it
+
+        Returns:
+            False if the movement was not made
+        """
+        if end_time is not None:
+            center, direction = advance(self.robot.center, self.robot.direction, [move])
+            if (self.clock.time() + self.timing.predict([move]) + self.overhead +
+                    self.return_seconds(center, direction) > end_time):
+                return False
+        readings = yield move, self.changes()
+        if readings is not None:
             self.robot.execute_nosend(move)
-            if self.robot.update_frontend:
-                self.robot.update_frontend(
-                    self.robot.current_map, self.robot.center, self.robot.cal_head())
+            self.robot.sense(readings)
+        return True
 
-        self.robot.receive()
-        if self.robot.direction != WEST:
-            calibrate_movement = self.robot.correct_direction(WEST)
-            for move in calibrate_movement:
+    def changes(self):
+        """
+        (row, col) of the map cells that changed since the last call
+        """
+        changed = np.argwhere(self.robot.current_map != self.known)
+        self.known = self.robot.current_map.copy()
+        return changed
+
+    def drive(self, steps):
+        """
+        Run a generator of steps() to the end, executing each movement on the robot and
+        sensing after it
+
+        Returns:
+            The value returned by the generator
+        """
+        try:
+            move, _ = next(steps)
+            while True:
                 self.robot.execute(move)
-                if self.robot.update_frontend:
-                    self.robot.update_frontend(
-                        self.robot.current_map, self.robot.center, self.robot.cal_head())
-        time.sleep(5)
-        # MDF_string = generate.MDFString()
-        # self.robot.send('Z'+MDF_string)
-        self.robot.send('C')
+                self.robot.update_map()
+                move, _ = next(steps)
+        except StopIteration as stop:
+            return stop.value
+
+    def return_path(self, center=None, direction=None):
+        """
+        Shortest path from the pose (the robot pose by default) to the start zone, followed
+        on the distance field of the start zone, which is kept across map updates and only
+        rebuilt when a cell it depends on changes
+
+        Returns:
+            List of (row, col, heading)
+
+        Raises:
+            ValueError if the start zone cannot be reached
+        """
+        if center is None:
+            center, direction = self.robot.center, self.robot.direction
+        self.robot.traversable.refresh()
+        field = distance_field(self.robot.traversable, self.start_zone)
+        return field.path_from(center, direction)
+
+    def return_seconds(self, center=None, direction=None):
+        """
+        Predicted seconds from the pose to the robot standing in the start zone, inf if it
+        cannot be reached
+        """
+        try:
+            states = self.return_path(center, direction)
+        except ValueError:
+            return float('inf')
+        return RETURN_PAUSE + self.return_overhead + self.timing.predict(statespace.movements(states))
+
+    def return_movements(self):
+        """
+        Movements back to the start zone: the time-optimal path with a motion profile,
+        otherwise the path the time reserved for the return was predicted on
+        """
+        if self.profile is not None:
+            self.robot.traversable.refresh()
+            states, _, _ = costmodel.astar(self.robot.traversable, self.robot.center,
+                                           self.robot.direction, self.start_zone, self.profile)
+            return statespace.movements(states)
+        return statespace.movements(self.return_path())
+
+    def plan_nearest(self, planner):
+        """
+        The cheapest reachable goal of a multi-goal planner and the movements to it,
+        found by a single (incrementally repaired) search
+
+        Returns:
+            (goal pose, movements), or (None, []) if no goal can be reached
+        """
+        self.robot.traversable.refresh()
+        try:
+            states = planner.plan(self.robot.center, self.robot.direction)
+        except ValueError:
+            return None, []
+        return states[-1], statespace.movements(states)
+
+    def explore_frontiers(self, start_time, end_time=None):
+        """
+        Steps driving to the best viewpoint on the frontier of the explored area until none is left
+
+        Returns:
+            False if the coverage is reached, True when the robot should return to the start zone
+        """
+        while not self.check_completed():
+            target = self.next_frontier()
+            if target is None:
+                # what is left cannot be seen from anywhere the robot can go
+                return True
+            seen, movements = target
+            for move in movements:
+                if not (yield from self.step(move, end_time)):
+                    self.time_over(start_time)
+                    return True
+                if self.coverage:
+                    actual_coverage = self.robot.compute_coverage()
+                    if actual_coverage >= self.coverage:
+                        self.log('Coverage: {:.2f}'.format(actual_coverage))
+                        return False
+                # seen on the way already
+                if all(self.robot.current_map[cell] != 0 for cell in seen):
+                    break
+        return True
+
+    def sensed_unknown(self, center, direction):
+        """
+        Unknown cells the sensors would reach from the pose, assuming unknown cells are free
+        """
+        known = self.robot.current_map
+        seen = set()
+        for grids in self.robot.get_sensor_grids(center, direction):
+            for cell in grids:
+                if known[cell] == 2:
+                    break
+                if known[cell] == 0:
+                    seen.add(cell)
+        return seen
+
+    def next_frontier(self):
+        """
+        The viewpoint with the most unknown cells sensed per unit of travel from the robot pose,
+        ties going to the nearer one
+
+        Returns:
+            (cells the pose would sense, movements to the pose), or None if no unknown cell
+            can be sensed from anywhere the robot can go
+        """
+        self.robot.traversable.refresh()
+        gain = information_gain(self.robot.current_map, self.robot.traversable.mask)
+        current = (int(self.robot.center[0]), int(self.robot.center[1]), self.robot.direction)
+        dist, parent = statespace.dijkstra(self.robot.traversable, current[:2], current[2])
+        best = None
+        for state, cost in dist.items():
+            seen = gain[state[0], state[1], state[2]-1]
+            if state == current or seen == 0:
+                continue
+            score = (seen / cost, -cost)
+            if best is None or score > best[0]:
+                best = (score, state)
+        if best is None:
+            return None
+        state = best[1]
+        return (self.sensed_unknown(state[:2], state[2]),
+                statespace.movements(statespace.trace(parent, state)))
 
     def check_valid(self, coord):
         """
         Check if the given coordinate is valid ( 3x3 neighourhood is within the wall and has value 1)
         """
-        r, c = coord
-        x, y = np.meshgrid([-1, 0, 1], [-1, 0, 1])
-        x, y = x+r, y+c
-        if np.any(x < 0) or np.any(y < 0) or np.any(x >= MAX_ROWS) or np.any(y >= MAX_COLS):
-            return False
-        elif np.any(self.robot.current_map[x[0, 0]:x[0, 2]+1, y[0, 0]:y[2, 0]+1] != 1):
-            return False
-        else:
-            return True
+        return self.robot.traversable.check_valid(coord)
 
     def check_completed(self):
         """
@@ -213,47 +435,51 @@ class Exploration:
         """
         return np.all(self.robot.current_map)
 
-    def move(self):
+    def move(self, end_time=None):
         """
         compute the next move and execute the action
         the move returned is for recording and bebugging only
+
+        Args:
+            end_time: float, optional
+                clock.time() by which the robot must be back in the start zone
+
+        Returns:
+            The movements executed, None if the time left is needed to return to the start zone
+        """
+        return self.drive(self.follow_wall(end_time))
+
+    def follow_wall(self, end_time=None):
+        """
+        Steps of the next move of the right wall follower, see steps()
+
+        Returns:
+            The movements made, None if the time left is needed to return to the start zone
         """
         move = ''
 
         if self.direction_clear('LEFT'):
-            self.robot.execute(LEFT)
-            move += LEFT
-            self.robot.update_map()
-            if self.direction_clear('FRONT'):
-                self.robot.execute(FORWARD)
-                move += FORWARD
-                self.robot.update_map()
+            turns = [LEFT]
         elif self.direction_clear('FRONT'):
-            self.robot.execute(FORWARD)
-            move += FORWARD
-            self.robot.update_map()
+            turns = []
         elif self.direction_clear('RIGHT'):
-            self.robot.execute(RIGHT)
-            move += RIGHT
-            self.robot.update_map()
-            if self.direction_clear('FRONT'):
-                self.robot.execute(FORWARD)
-                move += FORWARD
-                self.robot.update_map()
+            turns = [RIGHT]
         else:
-            self.robot.execute(LEFT)
-            move += LEFT
-            self.robot.update_map()
-            self.robot.execute(LEFT)
-            move += LEFT
-            self.robot.update_map()
+            turns = [LEFT, LEFT]
+        for turn in turns:
+            if not (yield from self.step(turn, end_time)):
+                return None
+            move += turn
+        # move on after turning to a clear side, not after turning around
+        if len(turns) < 2 and self.direction_clear('FRONT'):
+            if not (yield from self.step(FORWARD, end_time)):
+                return None
+            move += FORWARD
 
         # mark if robot returns to the initial position after one round
-        if (self.robot.center == START).all():
+        if (self.robot.center == self.start_zone).all():
             self.one_round_completed = True
-            print('one round completed!!!!')
-            np.savetxt('map/currentmap.txt',
-                       self.robot.current_map, '%d', delimiter='')
+            self.log('one round completed!!!!')
         return move
 
     def direction_clear(self, direction: str):
@@ -262,33 +488,8 @@ class Exploration:
         Return:
             Boolean
         """
-        # convert to the objective direction corresponding to robot's subjective direction FRONT, LEFT, RIGHT
-        orientation = dict()
-        if self.robot.direction == NORTH:
-            orientation = {'FRONT': NORTH, 'LEFT': WEST, 'RIGHT': EAST}
-        elif self.robot.direction == EAST:
-            orientation = {'FRONT': EAST, 'LEFT': NORTH, 'RIGHT': SOUTH}
-        elif self.robot.direction == SOUTH:
-            orientation = {'FRONT': SOUTH, 'LEFT': EAST, 'RIGHT': WEST}
-        else:
-            orientation = {'FRONT': WEST, 'LEFT': SOUTH, 'RIGHT': NORTH}
-
-        # get the actual grids to check according to the objective direction
-        row, col = self.robot.center
-        grids = list()
-        if orientation[direction] == NORTH:
-            grids = [[row-2, col-1], [row-2, col], [row-2, col+1]]
-        elif orientation[direction] == EAST:
-            grids = [[row-1, col+2], [row, col+2], [row+1, col+2]]
-        elif orientation[direction] == SOUTH:
-            grids = [[row+2, col-1], [row+2, col], [row+2, col+1]]
-        else:
-            grids = [[row-1, col-2], [row, col-2], [row+1, col-2]]
-
-        # check if the grids to move is within the wall and empty
-        grids_empty = True
-        for (x, y) in grids:
-            if x < self.virtual_wall[0] or x >= self.virtual_wall[2] or y < self.virtual_wall[1] or y >= self.virtual_wall[3]:
-                return False
-            grids_empty = grids_empty and self.robot.current_map[x, y] == 1
-        return grids_empty
+        # the objective heading of the robot's subjective direction FRONT, LEFT, RIGHT, and the
+        # cells a forward that way would move onto (None if off the map)
+        r, c = self.robot.center
+        cells = self.geometry.front(int(r), int(c), SIDES[(self.robot.direction, direction)])
+        return cells is not None and all(self.robot.current_map[cell] == 1 for cell in cells)
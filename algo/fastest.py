@@ -1,71 +1,115 @@
 #!/usr/bin/env python3
-import copy
+import heapq
 import numpy as np
 
-from algo.constants import NORTH, SOUTH, EAST, WEST, MAX_ROWS, MAX_COLS, FORWARD, LEFT, RIGHT, START, GOAL, SIMU_MAP_FILE
+from algo.constants import NORTH, SOUTH, START, GOAL, SIMU_MAP_FILE, \
+    PLAN_CELL, PLAN_HEADING, PLAN_FIELD, PLAN_HIERARCHICAL, PLAN_JPS, PLAN_ANYTIME, PLAN_TIMED, \
+    PLAN_BIDIRECTIONAL, PLAN_MODES
 from algo.mapmethod import map_from_file
-
-
-class Node:
-
-    """
-    The Node of the FSP graph
-
-    Attributes:
-        coord: tuple
-            (row, col)
-        g: int
-            cost from start to current
-        h: int
-            (under)estimated cost from current to goal
-        parent: Node
-            The parent of this node
-        grid_val: int
-            The value( 0 or 1 or 2) of the grid in the map
-    """
-
-    def __init__(self, coord, grid_val, h):
-        self.coord = coord
-        self.grid_val = grid_val
-        self.parent = None
-        self.h = h
-        self.g = float('inf')
+from algo import statespace, movement, costmodel
+from algo.anytime import AnytimeAStar
+from algo.distfield import distance_field
+from algo.geometry import pose_table
+from algo.hierarchical import hierarchical_planner
+from algo.jps import JumpPointSearch, axis_costs
+from algo.traversable import TraversableMap
 
 
 class FastestPath:
 
     """
-    Implementation of the Astar algorithm to get fastest path in the 20x15 maze
+    Implementation of the Astar algorithm to get fastest path in the maze (20x15 by default, any size
+    given by the map)
+
+    The search modes are:
+        PLAN_CELL: A* over cells, charging a turn relative to the initial direction
+        PLAN_HEADING: A* over (row, col, heading) with explicit turn and forward costs,
+            which gives paths with the minimal number of turns and moves
+        PLAN_FIELD: the same costs as PLAN_HEADING, answered by lookup in a distance field
+            rooted at the goal and cached on the traversability layer, so repeated queries
+            to the same goal are effectively free
+        PLAN_HIERARCHICAL: HPA* over clusters of the map, for large arenas. Near-optimal in
+            cells moved; local map changes only rebuild the clusters they touch
+        PLAN_JPS: the costs of PLAN_CELL, searched by jumping over open floor (jump point
+            search) instead of expanding it cell by cell
+        PLAN_ANYTIME: the costs of PLAN_HEADING, searched by ARA*. A first path is found
+            quickly and improved until the deadline, the bound it reached is kept in bound
+        PLAN_TIMED: the path the robot drives in the least time according to its motion
+            profile, where straight runs are cheaper than the same cells with stops between
+        PLAN_BIDIRECTIONAL: the costs of PLAN_HEADING, searched from the start pose and from
+            the goal (with any arrival heading) at once, for long queries across large cluttered
+            arenas. On the stock maps and on open floor PLAN_HEADING expands fewer states
 
     """
 
-    def __init__(self, map_, start, goal, init_direction, waypoint=np.array([]), simulation=True):
+    def __init__(self, map_, start, goal, init_direction, waypoint=np.array([]), simulation=True, traversable=None, mode=PLAN_CELL, deadline=None, profile=None, n_alternatives=0):
         """
         Constructor to initialize an instance of the FastestPath class
 
         Args:
             map_: np array
                 The map passed into FSP
-            graph: List
+            g, h, parent, grid_val: np array
+                The FSP graph as flat arrays indexed by cell id (row * cols + col): cost from
+                start, (under)estimated cost to goal, parent cell id (-1 for none) and the value
+                ( 0 or 1 or 2) of the grid in the map. Allocated once and reset on every run()
+            visited, order: np array
+                The search state of astar() by cell id: expanded or not, and the order in which
+                cells entered the frontier (-1 if never). Allocated and reset with the graph
             start: List 
                 Coordinates of the starting position
             goal: List 
                 Coordinates of the goal cell (center of the goal zone)
             waypoint: List
-                The coordinate of the way-point
+                The coordinate of the way-point, or a list of way-points to visit in order.
+                Routes through way-points are always searched over (row, col, heading)
             direction: int
                 The direction of the virtual robot
             init_direction: int (constant)
                 The starting direction of the robot
-            fsp: List<Node>
-                The fastest path
+            fsp: List
+                The cells (row, col) of the fastest path, from start to goal
             simulation: Boolean
                 Whether it's in simulation mode or real run
             movements: List<int>:
                 The movements robot should perform
+            traversable: TraversableMap, optional
+                Traversability layer of map_ to share with the caller, built from map_ if not given
+            mode: str
+                The search mode, PLAN_CELL, PLAN_HEADING, PLAN_FIELD, PLAN_HIERARCHICAL, PLAN_JPS
+                or PLAN_ANYTIME or PLAN_TIMED or PLAN_BIDIRECTIONAL
+            deadline: float, optional
+                time.time() by which PLAN_ANYTIME stops improving its path, no limit if None
+            profile: MotionProfile, optional
+                Time taken by the robot for its movements, the default profile if not given
+            expanded: int
+                Number of nodes expanded by the last search
+            cost: int
+                Cost of the fastest path (not set by PLAN_CELL without way-points), in seconds
+                for PLAN_TIMED
+            seconds: float
+                Time the robot is predicted to take for the movements
+            bound: float
+                Suboptimality bound of the path found by PLAN_ANYTIME: its cost is at most
+                bound times the optimal cost
+            unreachable: List
+                Candidate goals known to be unreachable after run_nearest()
+            n_alternatives: int
+                Number of alternative paths to prepare alongside the fastest path
+            alternatives: List
+                Diverse near-optimal alternatives to the fastest path, ranked by cost (in
+                movements), as (cost, fsp, movements, center_directions). Ready for fallback() if a cell on
+                the fastest path turns out to be blocked during the run
         """
+        if mode not in PLAN_MODES:
+            raise ValueError('Unknown planner mode: {}'.format(mode))
         self.map_ = map_
-        self.graph = []
+        self.g = None
+        self.h = None
+        self.parent = None
+        self.grid_val = None
+        self.visited = None
+        self.order = None
         self.start = start
         self.goal = goal
         self.waypoint = waypoint
@@ -75,91 +119,278 @@ class FastestPath:
         self.simulation = simulation
         self.movements = []
         self.center_directions = []
+        if traversable is None:
+            traversable = TraversableMap(map_)
+        self.traversable = traversable
+        self.mode = mode
+        self.deadline = deadline
+        self.expanded = 0
+        self.cost = None
+        self.bound = None
+        if profile is None:
+            profile = costmodel.MotionProfile()
+        self.profile = profile
+        self.seconds = None
+        self.unreachable = []
+        self.n_alternatives = n_alternatives
+        self.alternatives = []
 
     def run(self):
         """
         starting point of the FSP algo
         """
         fsp = []
-        print(self.waypoint)
-        # if self.waypoint.size != 0:
-        #     # from start to waypoint
-        #     self.init_graph(self.start, self.waypoint)
-        #     fsp.extend(self.astar(self.start, self.waypoint)[:-1])
-        #     # from waypoint to goal
-        #     self.init_graph(self.waypoint, self.goal)
-        #     fsp.extend(self.astar(self.start, self.waypoint))
-        # else:
-        self.init_graph(self.start, self.goal)
-        fsp.extend(self.astar(self.start, self.goal))
-        # show fsp
+        self.movements = []
+        self.center_directions = []
+        self.direction = self.init_direction
+        self.traversable.refresh()
+        waypoints = np.asarray(self.waypoint, dtype=int).reshape(-1, 2)
+        if len(waypoints):
+            fsp.extend(self.route_waypoints(waypoints))
+        elif self.mode == PLAN_HEADING:
+            fsp.extend(self.heading_astar(self.start, self.goal))
+        elif self.mode == PLAN_FIELD:
+            field = distance_field(self.traversable, self.goal)
+            fsp.extend(self.states_to_path(
+                field.path_from(self.start, self.init_direction)))
+        elif self.mode == PLAN_HIERARCHICAL:
+            planner = hierarchical_planner(self.traversable)
+            fsp.extend(planner.plan(self.start, self.goal))
+            self.expanded = planner.expanded
+        elif self.mode == PLAN_JPS:
+            search = JumpPointSearch(self.traversable, axis_costs(self.init_direction))
+            fsp.extend(search.search(self.start, self.goal))
+            self.expanded = search.expanded
+        elif self.mode == PLAN_ANYTIME:
+            search = AnytimeAStar(self.traversable)
+            fsp.extend(self.states_to_path(
+                search.search(self.start, self.init_direction, self.goal, self.deadline)))
+            self.expanded = search.expanded
+            self.bound = search.bound
+        elif self.mode == PLAN_TIMED:
+            states, self.expanded, seconds = costmodel.astar(
+                self.traversable, self.start, self.init_direction, self.goal, self.profile)
+            fsp.extend(self.states_to_path(states))
+            self.cost = seconds
+        elif self.mode == PLAN_BIDIRECTIONAL:
+            states, self.expanded = statespace.bidirectional(
+                self.traversable, self.start, self.init_direction, self.goal)
+            fsp.extend(self.states_to_path(states))
+        else:
+            self.init_graph(self.start, self.goal)
+            fsp.extend(self.astar(self.start, self.goal))
         self.fsp = fsp
-        prev = None
-        for coor in fsp:
-            if prev:
-                self.turn_direction(prev, coor)
-            prev = coor
         # calculate movements
         self.cal_movements()
+        self.alternatives = []
+        if self.n_alternatives and not len(waypoints):
+            self.cal_alternatives()
+
+    def cal_alternatives(self):
+        """
+        Prepare alternatives to the fastest path sharing as few cells with it as possible
+        """
+        # states_to_path() sets the cost of the fastest path
+        fastest_cost = self.cost
+        for cost, states in statespace.alternatives(self.traversable, self.start, self.init_direction,
+                                                    self.goal, avoid=self.fsp, k=self.n_alternatives):
+            fsp = self.states_to_path(states)
+            movements, center_directions, _ = movement.compile_path(fsp, self.init_direction)
+            self.alternatives.append((cost, fsp, movements, center_directions))
+        self.cost = fastest_cost
+
+    def fallback(self, blocked, center=None, direction=None):
+        """
+        The cheapest prepared alternative that avoids the blocked cells, continued from where
+        the robot is. No search is run.
+
+        Args:
+            blocked: List
+                (row, col) of cells found to be obstacles
+            center: List, optional
+                Coordinates of the robot, the start if None
+            direction: int, optional
+                The direction of the robot, the initial direction if None
+
+        Returns:
+            (fsp, movements, center_directions) from the robot to the goal, or None if every
+            alternative is blocked or does not pass by the robot
+        """
+        if center is None:
+            center, direction = self.start, self.init_direction
+        center = (int(center[0]), int(center[1]))
+        blocked = [(int(r), int(c)) for r, c in blocked]
+        for _, fsp, _, _ in self.alternatives:
+            if center not in fsp:
+                continue
+            rest = fsp[fsp.index(center):]
+            # the robot footprint is the 3x3 block around its centre
+            if any(abs(r - br) <= 1 and abs(c - bc) <= 1 for r, c in rest for br, bc in blocked):
+                continue
+            movements, center_directions, _ = movement.compile_path(rest, direction)
+            return rest, movements, center_directions
+        return None
+
+    def run_nearest(self, goals):
+        """
+        Fastest path to the cheapest reachable goal among several candidates, found by a
+        single search. The goal given to the constructor is replaced by the chosen one.
+
+        Args:
+            goals: List
+                Candidate goals, either (row, col) reached with any heading or (row, col, heading)
+
+        Returns:
+            The chosen goal, or None if no candidate can be reached. The candidates the
+            robot cannot drive to from the start are listed in self.unreachable
+        """
+        self.movements = []
+        self.center_directions = []
+        self.direction = self.init_direction
+        self.traversable.refresh()
+        idx, states, self.expanded = statespace.nearest(
+            self.traversable, self.start, self.init_direction, goals)
+        if idx is None:
+            self.fsp = []
+            self.unreachable = list(goals)
+            return None
+        region = self.traversable.region(self.start)
+        self.unreachable = [goal for goal in goals if not self.traversable.check_valid(goal[:2])
+                            or not region[int(goal[0]), int(goal[1])]]
+        self.goal = goals[idx]
+        self.fsp = self.states_to_path(states)
+        self.movements = statespace.movements(states)
+        self.center_directions = [(state[:2], state[2]) for state in states[1:]]
+        self.direction = states[-1][2]
+        self.seconds = self.profile.predict(self.movements)
+        return self.goal
 
     def compute_heuristic(self, start, goal):
-        col_idx, row_idx = np.meshgrid(range(0, 15), range(0, 20))
+        rows, cols = self.map_.shape
+        col_idx, row_idx = np.meshgrid(range(0, cols), range(0, rows))
         h_matrix = (row_idx - goal[0]) + (col_idx - goal[1])
         return h_matrix
 
     def init_graph(self, start, goal):
-        h_matrix = self.compute_heuristic(start, goal)
-        for r in range(MAX_ROWS):
-            each_row = []
-            for c in range(MAX_COLS):
-                each_row.append(Node((r, c), self.map_[r][c], h_matrix[r][c]))
-            self.graph.append(each_row)
+        """
+        Allocate the graph arrays on first use and reset them for a new search
+        """
+        size = self.map_.size
+        if self.g is None or self.g.size != size:
+            self.g = np.empty(size)
+            self.h = np.empty(size)
+            self.parent = np.empty(size, dtype=int)
+            self.grid_val = np.empty(size, dtype=int)
+            self.visited = np.empty(size, dtype=bool)
+            self.order = np.empty(size, dtype=int)
+        self.reset(start, goal)
+
+    def reset(self, start, goal):
+        """
+        Reset the graph arrays in place for a search from start to goal
+        """
+        self.g.fill(np.inf)
+        self.parent.fill(-1)
+        self.h[:] = self.compute_heuristic(start, goal).ravel()
+        self.grid_val[:] = self.map_.ravel()
+        self.visited.fill(False)
+        self.order.fill(-1)
 
     def astar(self, start, goal):
-        goal_node = self.graph[goal[0]][goal[1]]
-        # set of visited nodes
-        visited = list()
-        # set of frontier nodes
-        frontier = list()
-        # current node
-        cur = self.graph[start[0]][start[1]]
-        cur.g = 0
-        frontier.append(cur)
-        prev = None
+        """
+        A* search over the graph from start to goal.
+
+        The frontier is a binary heap keyed on (f, order), where order is the
+        first time a node entered the frontier, so ties are broken exactly as
+        a linear min() over an insertion-ordered list would break them.
+        Improved nodes are pushed again and stale heap entries are skipped
+        when popped.
+
+        Returns:
+            List of (row, col) from start to goal
+        """
+        cols = self.map_.shape[1]
+        g, h, parent = self.g, self.h, self.parent
+        # expanded nodes, and the insertion order of the nodes that have entered the frontier
+        visited, order = self.visited, self.order
+        goal_id = int(goal[0]) * cols + int(goal[1])
+        expanded = 0
+        entered = 1
+        # heap of (f, order, g, cell id)
+        frontier = []
+        cur = int(start[0]) * cols + int(start[1])
+        g[cur] = 0
+        order[cur] = 0
+        heapq.heappush(frontier, (g[cur] + h[cur], 0, g[cur], cur))
 
         while frontier:
-            cur = min(frontier, key=lambda x: x.g + x.h)
-            if cur == goal_node:
+            _, _, cur_g, cur = heapq.heappop(frontier)
+            if visited[cur] or cur_g != g[cur]:
+                # stale entry of an already expanded or improved node
+                continue
+            if cur == goal_id:
+                self.expanded = expanded
                 path = []
-                while cur:
-                    path.append(cur.coord)
-                    cur = cur.parent
+                while cur != -1:
+                    path.append(divmod(cur, cols))
+                    cur = int(parent[cur])
                 return path[::-1]
-            else:
-                frontier.remove(cur)
-                for neighour in self.get_neighbours(cur):
-                    if neighour in visited:
+            visited[cur] = True
+            expanded += 1
+            cur_coord = divmod(cur, cols)
+            for neighour in self.get_neighbours(cur):
+                if visited[neighour]:
+                    continue
+                new_g = cur_g + \
+                    self.calculate_g(cur_coord, divmod(neighour, cols))
+                if order[neighour] >= 0:
+                    if g[neighour] <= new_g:
                         continue
-                    if neighour in frontier:
-                        # calculate new g()
-                        new_g = cur.g + \
-                            self.calculate_g(cur.coord, neighour.coord)
-                        if neighour.g > new_g:
-                            neighour.g = new_g
-                            neighour.parent = cur
-                    else:
-                        # cost of moving between neighbours is 1
-                        neighour.g = cur.g + \
-                            self.calculate_g(cur.coord, neighour.coord)
-                        neighour.parent = cur
-                        if neighour not in frontier:
-                            frontier.append(neighour)
-                if cur not in visited:
-                    visited.append(cur)
-            prev = copy.deepcopy(cur)
+                else:
+                    order[neighour] = entered
+                    entered += 1
+                g[neighour] = new_g
+                parent[neighour] = cur
+                heapq.heappush(frontier, (new_g + h[neighour],
+                                          int(order[neighour]), new_g, neighour))
         # exception is no path is found
         raise ValueError('No Path Found')
 
+    def route_waypoints(self, waypoints):
+        """
+        Fastest route from start through the waypoints (in order) to goal.
+        The headings at the waypoints are optimised jointly over the whole route, and the
+        legs are cached on the traversability layer so re-planning on the same map is free.
+
+        Returns:
+            List of (row, col) from start to goal
+        """
+        points = [self.start] + list(waypoints) + [self.goal]
+        states = statespace.route(self.traversable, points, self.init_direction)
+        return self.states_to_path(states)
+
+    def heading_astar(self, start, goal):
+        """
+        A* over (row, col, heading) states starting with the initial direction
+
+        Returns:
+            List of (row, col) from start to goal
+        """
+        states, self.expanded = statespace.astar(
+            self.traversable, start, self.init_direction, goal)
+        return self.states_to_path(states)
+
+    def states_to_path(self, states):
+        """
+        Convert a sequence of (row, col, heading) into the cells visited
+        """
+        self.cost = statespace.path_cost(states)
+        path = [states[0][:2]]
+        for state in states[1:]:
+            if state[:2] != path[-1]:
+                path.append(state[:2])
+        return path
+
     # def sensor_reachable(self, cur, goal):
     #     cur = cur.coord
     #     r, c = goal.coord
@@ -168,44 +399,20 @@ class FastestPath:
     #     else:
     #         return False
 
-    def turn_direction(self, prev_coord, cur_coord):
-        print(prev_coord)
-        print(cur_coord)
-        if prev_coord[0] < cur_coord[0]:
-            self.direction = SOUTH
-        elif prev_coord[1] < cur_coord[1]:
-            self.direction = EAST
-        elif prev_coord[1] > cur_coord[1]:
-            self.direction = WEST
-        else:
-            self.direction = NORTH
-        print(self.direction)
-
-    def get_neighbours(self, node):
+    def get_neighbours(self, cell):
         """
-        Returns the coordinates of valid neighours which are explored and are not obstacles 
+        Returns the ids of valid neighours which are explored and are not obstacles 
         ( has grid alue 1)
 
         """
-        r, c = node.coord
-        neighour_idxs = [(r-1, c), (r+1, c), (r, c-1), (r, c+1)]
-        neighours = [self.graph[n[0]][n[1]]
-                     for n in neighour_idxs if self.check_valid(n)]
-        return neighours
+        mask = self.traversable.mask.flat
+        return [n for n in pose_table(self.map_.shape).adjacent(cell) if mask[n]]
 
     def check_valid(self, coord):
         """
         Check if the given coordinate is valid ( 3x3 neighourhood is within the wall and has value 1)
         """
-        r, c = coord
-        x, y = np.meshgrid([-1, 0, 1], [-1, 0, 1])
-        x, y = x+r, y+c
-        if np.any(x < 0) or np.any(y < 0) or np.any(x >= MAX_ROWS) or np.any(y >= MAX_COLS):
-            return False
-        elif np.any(self.map_[x[0, 0]:x[0, 2]+1, y[0, 0]:y[2, 0]+1] != 1):
-            return False
-        else:
-            return True
+        return self.traversable.check_valid(coord)
 
     def calculate_g(self, cur_coord, next_coord):
         if self.direction in [NORTH, SOUTH]:
@@ -214,86 +421,12 @@ class FastestPath:
             return 1 if cur_coord[0] == next_coord[0] else 2
 
     def cal_movements(self):
-        robot_center = copy.deepcopy(self.start)
-        robot_direction = copy.deepcopy(self.init_direction)
-        for coord in self.fsp:
-            movement = []
-            tmp_center_directions = []
-            if robot_center.tolist() != coord:
-                diff = robot_center - np.asarray(coord)
-                robot_center = tuple(robot_center)
-                if (diff[0] == -1 and diff[1] == 0):  # Going south
-                    if robot_direction == NORTH:
-                        movement.extend((RIGHT, RIGHT, FORWARD))
-                        tmp_center_directions.extend(
-                            [(robot_center, EAST), (robot_center, SOUTH), (coord, SOUTH)])
-                    elif robot_direction == EAST:
-                        movement.extend((RIGHT, FORWARD))
-                        tmp_center_directions.extend(
-                            [(robot_center, SOUTH), (coord, SOUTH)])
-                    elif robot_direction == SOUTH:
-                        movement.append(FORWARD)
-                        tmp_center_directions.extend([(coord, SOUTH)])
-                    else:
-                        movement.extend((LEFT, FORWARD))
-                        tmp_center_directions.extend(
-                            [(robot_center, WEST), (coord, SOUTH)])
-                    robot_direction = SOUTH
-                elif (diff[0] == 0 and diff[1] == 1):  # Going west
-                    if robot_direction == NORTH:
-                        movement.extend((LEFT, FORWARD))
-                        tmp_center_directions.extend(
-                            [(robot_center, WEST), (coord, WEST)])
-                    elif robot_direction == EAST:
-                        movement.extend((RIGHT, RIGHT, FORWARD))
-                        tmp_center_directions.extend(
-                            [(robot_center, SOUTH), (robot_center, WEST), (coord, WEST)])
-                    elif robot_direction == SOUTH:
-                        movement.extend((RIGHT, FORWARD))
-                        tmp_center_directions.extend(
-                            [(robot_center, WEST), (coord, WEST)])
-                    else:
-                        movement.append(FORWARD)
-                        tmp_center_directions.extend([(coord, WEST)])
-                    robot_direction = WEST
-                elif (diff[0] == 0 and diff[1] == -1):  # Going east
-                    if robot_direction == NORTH:
-                        movement.extend((RIGHT, FORWARD))
-                        tmp_center_directions.extend(
-                            [(robot_center, EAST), (coord, EAST)])
-                    elif robot_direction == EAST:
-                        movement.append(FORWARD)
-                        tmp_center_directions.extend([(coord, EAST)])
-                    elif robot_direction == SOUTH:
-                        movement.extend((LEFT, FORWARD))
-                        tmp_center_directions.extend(
-                            [(robot_center, EAST), (coord, EAST)])
-                    else:
-                        movement.extend((RIGHT, RIGHT, FORWARD))
-                        tmp_center_directions.extend(
-                            [(robot_center, NORTH), (robot_center, EAST), (coord, EAST)])
-                    robot_direction = EAST
-                elif (diff[0] == 1 and diff[1] == 0):  # Going north
-                    if robot_direction == NORTH:
-                        movement.append(FORWARD)
-                        tmp_center_directions.extend([(coord, NORTH)])
-                    elif robot_direction == EAST:
-                        movement.extend((LEFT, FORWARD))
-                        tmp_center_directions.extend(
-                            [(robot_center, NORTH), (coord, NORTH)])
-                    elif robot_direction == SOUTH:
-                        movement.extend((RIGHT, RIGHT, FORWARD))
-                        tmp_center_directions.extend(
-                            [(robot_center, WEST), (robot_center, NORTH), (coord, NORTH)])
-                    else:
-                        movement.extend((RIGHT, FORWARD))
-                        tmp_center_directions.extend(
-                            [(robot_center, NORTH), (coord, NORTH)])
-                    robot_direction = NORTH
-                robot_center = np.asarray(robot_center)
-                robot_center -= diff
-            self.movements.extend(movement)
-            self.center_directions.extend(tmp_center_directions)
+        """
+        Compile the fastest path into movements, starting from the initial direction
+        """
+        self.movements, self.center_directions, self.direction = movement.compile_path(
+            self.fsp, self.init_direction)
+        self.seconds = self.profile.predict(self.movements)
 
 
 # testing FSP
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""Cells around the robot for every pose of an arena: sensor rays, clearance and footprint
+"""
+from algo.constants import NORTH, EAST, SOUTH, WEST
+
+# cells reached by the six sensors of a robot facing NORTH, as (row, col) offsets from its
+# centre in the order they are sensed (front left, front centre, front right, right top,
+# left bottom, left top)
+SENSORS_NORTH = (
+    ((-2, -1), (-3, -1)),
+    ((-2, 0), (-3, 0)),
+    ((-2, 1), (-3, 1)),
+    ((-1, 2), (-1, 3), (-1, 4), (-1, 5)),
+    ((1, -2), (1, -3)),
+    ((-1, -2), (-1, -3)),
+)
+# cells a robot facing NORTH moves onto with a forward
+FRONT_NORTH = ((-2, -1), (-2, 0), (-2, 1))
+# cells covered by the robot, whatever its heading
+FOOTPRINT = tuple((dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1))
+
+
+def rotate(offsets):
+    """
+    Offsets turned a quarter clockwise: (row, col) -> (col, -row)
+    """
+    return tuple((dc, -dr) for dr, dc in offsets)
+
+
+def _headings(north):
+    table = {NORTH: north}
+    for prev, nxt in ((NORTH, EAST), (EAST, SOUTH), (SOUTH, WEST)):
+        table[nxt] = tuple(rotate(ray) for ray in table[prev])
+    return table
+
+
+SENSORS = _headings(SENSORS_NORTH)
+FRONT = {d: rays[0] for d, rays in _headings((FRONT_NORTH,)).items()}
+# furthest a sensor reaches from the centre, along either axis
+REACH = max(max(abs(dr), abs(dc)) for ray in SENSORS_NORTH for dr, dc in ray)
+# longest ray
+LENGTH = max(len(ray) for ray in SENSORS_NORTH)
+# heading of each side of the robot, by (robot heading, side)
+SIDES = {(d, side): (d + turn - 1) % 4 + 1
+         for d in (NORTH, EAST, SOUTH, WEST) for side, turn in (('FRONT', 0), ('LEFT', -1), ('RIGHT', 1))}
+
+
+class PoseTable:
+
+    """
+    The cells around every pose of an arena, as tuples of (row, col) clipped to the map.
+    Each pose is worked out the first time it is asked for and looked up afterwards.
+
+    Attributes:
+        shape: tuple
+            (rows, cols) of the arena
+    """
+
+    def __init__(self, shape):
+        self.shape = shape
+        rows, cols = shape
+        # by flat pose index (row * cols + col) * 4 + heading - 1
+        self._sensors = [None] * (rows * cols * 4)
+        self._fronts = [None] * (rows * cols * 4)
+        # by flat cell index
+        self._adjacent = [None] * (rows * cols)
+
+    def inside(self, r, c):
+        return 0 <= r < self.shape[0] and 0 <= c < self.shape[1]
+
+    def sensors(self, r, c, direction):
+        """
+        Cells each of the six sensors reaches from the pose, nearest first, up to the edge of the map
+        """
+        key = (r * self.shape[1] + c) * 4 + direction - 1
+        rays = self._sensors[key]
+        if rays is None:
+            rays = []
+            for ray in SENSORS[direction]:
+                cells = []
+                for dr, dc in ray:
+                    if not self.inside(r+dr, c+dc):
+                        break
+                    cells.append((r+dr, c+dc))
+                rays.append(tuple(cells))
+            rays = self._sensors[key] = tuple(rays)
+        return rays
+
+    def front(self, r, c, direction):
+        """
+        Cells the robot moves onto with a forward from the pose, None if one is off the map
+        """
+        key = (r * self.shape[1] + c) * 4 + direction - 1
+        cells = self._fronts[key]
+        if cells is None:
+            cells = tuple((r+dr, c+dc) for dr, dc in FRONT[direction])
+            if not all(self.inside(*cell) for cell in cells):
+                cells = ()
+            self._fronts[key] = cells
+        return cells or None
+
+    def adjacent(self, cell):
+        """
+        Flat indices of the cells next to a flat cell index, inside the map
+        """
+        cells = self._adjacent[cell]
+        if cells is None:
+            cols = self.shape[1]
+            r, c = divmod(cell, cols)
+            cells = tuple((r+dr) * cols + c+dc for dr, dc in ((-1, 0), (1, 0), (0, -1), (0, 1))
+                          if self.inside(r+dr, c+dc))
+            self._adjacent[cell] = cells
+        return cells
+
+
+# per arena shape
+_tables = dict()
+
+
+def pose_table(shape):
+    """
+    The pose table of arenas of the given (rows, cols), shared by everything planning on them
+    """
+    shape = tuple(shape)
+    if shape not in _tables:
+        _tables[shape] = PoseTable(shape)
+    return _tables[shape]
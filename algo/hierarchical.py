@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""Hierarchical pathfinding (HPA*) over the traversability mask for large arenas
+"""
+import heapq
+from collections import deque
+import numpy as np
+
+# (row, col) steps to the four neighbouring cells
+STEPS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+
+class HierarchicalPlanner:
+
+    """
+    The map is split into square clusters. Entrances are placed where the robot footprint can
+    cross the border between two adjacent clusters, and the costs between the entrances of a
+    cluster are precomputed. A query only searches the small abstract graph of entrances and
+    then refines the abstract path it chose, one cluster at a time.
+
+    Costs are counted in cells moved, so the paths are near-optimal in length.
+
+    Attributes:
+        traversable: TraversableMap
+            The traversability layer the planner follows
+        size: int
+            Side of a cluster, in cells
+        mask: np array of bool
+            The traversability mask the abstract graph was built from
+        entrances: dict
+            Border (cluster, cluster) -> list of (cell, cell) crossings
+        edges: dict
+            Cluster -> {entrance cell: {entrance cell: cost}} within the cluster
+        links: dict
+            Entrance cell -> set of entrance cells across a border
+        segments: dict
+            Cluster -> {(cell, cell): refined cells} already expanded inside the cluster
+        expanded: int
+            Number of abstract nodes expanded by the last query
+    """
+
+    def __init__(self, traversable, size=16):
+        self.traversable = traversable
+        self.size = size
+        rows, cols = traversable.shape
+        self.clusters = ((rows + size - 1) // size, (cols + size - 1) // size)
+        self.mask = traversable.mask.copy()
+        self.entrances = dict()
+        self.edges = dict()
+        self.links = dict()
+        self.segments = dict()
+        self.expanded = 0
+        every = [(i, j) for i in range(self.clusters[0]) for j in range(self.clusters[1])]
+        self.rebuild(every)
+
+    def cluster_of(self, cell):
+        return (cell[0] // self.size, cell[1] // self.size)
+
+    def bounds(self, cluster):
+        rows, cols = self.mask.shape
+        r0, c0 = cluster[0] * self.size, cluster[1] * self.size
+        return r0, min(r0 + self.size, rows), c0, min(c0 + self.size, cols)
+
+    def borders(self, cluster):
+        """
+        Borders of the cluster with its right and bottom neighbours, and of its left and
+        top neighbours with it
+        """
+        i, j = cluster
+        borders = []
+        for other in ((i, j+1), (i+1, j)):
+            if other[0] < self.clusters[0] and other[1] < self.clusters[1]:
+                borders.append((cluster, other))
+        for other in ((i, j-1), (i-1, j)):
+            if other[0] >= 0 and other[1] >= 0:
+                borders.append((other, cluster))
+        return borders
+
+    def find_entrances(self, border):
+        """
+        Crossings of the border between two adjacent clusters. Every maximal run of cells
+        the robot can cross gets one crossing in its middle, long runs one at each end.
+        """
+        (i, j), (k, _) = border
+        r0, r1, c0, c1 = self.bounds((i, j))
+        if k == i:
+            # vertical border: last column of the left cluster, first of the right one
+            side = [((r, c1-1), (r, c1)) for r in range(r0, r1)]
+        else:
+            side = [((r1-1, c), (r1, c)) for c in range(c0, c1)]
+        open_ = [self.mask[a] and self.mask[b] for a, b in side]
+        crossings = []
+        start = None
+        for idx, is_open in enumerate(open_ + [False]):
+            if is_open and start is None:
+                start = idx
+            elif not is_open and start is not None:
+                end = idx - 1
+                if end - start >= 6:
+                    crossings += [side[start], side[end]]
+                else:
+                    crossings.append(side[(start + end) // 2])
+                start = None
+        return crossings
+
+    def nodes(self, cluster):
+        """
+        Entrance cells lying inside the cluster
+        """
+        cells = set()
+        for border in self.borders(cluster):
+            first = border[0] == cluster
+            for a, b in self.entrances.get(border, []):
+                cells.add(a if first else b)
+        return cells
+
+    def local_costs(self, cluster, source, target=None):
+        """
+        BFS inside the cluster from source, stopping early once target is reached
+
+        Returns:
+            (dist, parent): dicts keyed by cell
+        """
+        r0, r1, c0, c1 = self.bounds(cluster)
+        dist = {source: 0}
+        parent = {source: None}
+        queue = deque([source])
+        while queue:
+            cell = queue.popleft()
+            for dr, dc in STEPS:
+                nxt = (cell[0] + dr, cell[1] + dc)
+                if nxt in dist or not (r0 <= nxt[0] < r1 and c0 <= nxt[1] < c1):
+                    continue
+                if self.mask[nxt]:
+                    dist[nxt] = dist[cell] + 1
+                    parent[nxt] = cell
+                    if nxt == target:
+                        return dist, parent
+                    queue.append(nxt)
+        return dist, parent
+
+    def rebuild(self, clusters):
+        """
+        Recompute the entrances around the clusters and the costs inside them
+        """
+        touched = set(clusters)
+        for cluster in clusters:
+            for border in self.borders(cluster):
+                for a, b in self.entrances.get(border, []):
+                    self.links.get(a, set()).discard(b)
+                    self.links.get(b, set()).discard(a)
+                crossings = self.find_entrances(border)
+                self.entrances[border] = crossings
+                for a, b in crossings:
+                    self.links.setdefault(a, set()).add(b)
+                    self.links.setdefault(b, set()).add(a)
+                touched.update(border)
+        # clusters across a rebuilt border may have gained or lost entrance cells
+        for cluster in touched:
+            nodes = self.nodes(cluster)
+            edges = dict()
+            for node in nodes:
+                dist, _ = self.local_costs(cluster, node)
+                edges[node] = {other: dist[other] for other in nodes
+                               if other != node and other in dist}
+            self.edges[cluster] = edges
+            self.segments.pop(cluster, None)
+
+    def refresh(self):
+        """
+        Rebuild only the clusters touched by traversability changes since the last query
+        """
+        flipped = np.argwhere(self.mask != self.traversable.mask)
+        if len(flipped) == 0:
+            return
+        self.mask = self.traversable.mask.copy()
+        self.rebuild({self.cluster_of(cell) for cell in map(tuple, flipped)})
+
+    def plan(self, start, goal):
+        """
+        Path from start to goal through the abstract graph, refined to cells
+
+        Returns:
+            List of (row, col) from start to goal
+
+        Raises:
+            ValueError if the goal cannot be reached
+        """
+        self.refresh()
+        start, goal = (int(start[0]), int(start[1])), (int(goal[0]), int(goal[1]))
+        if not (self.mask[start] and self.mask[goal]):
+            raise ValueError('No Path Found')
+        start_cluster, goal_cluster = self.cluster_of(start), self.cluster_of(goal)
+        # connect start and goal to the entrances of their clusters
+        start_dist, _ = self.local_costs(start_cluster, start)
+        goal_dist, _ = self.local_costs(goal_cluster, goal)
+        start_edges = {node: start_dist[node] for node in self.edges[start_cluster] if node in start_dist}
+        goal_edges = {node: goal_dist[node] for node in self.edges[goal_cluster] if node in goal_dist}
+        if start_cluster == goal_cluster and goal in start_dist:
+            start_edges[goal] = start_dist[goal]
+
+        def neighbours(node):
+            if node == start:
+                nexts = list(start_edges.items())
+            else:
+                nexts = list(self.edges[self.cluster_of(node)].get(node, {}).items())
+            nexts += [(other, 1) for other in self.links.get(node, ())]
+            if node in goal_edges:
+                nexts.append((goal, goal_edges[node]))
+            return nexts
+
+        def h(node):
+            return abs(node[0] - goal[0]) + abs(node[1] - goal[1])
+
+        g = {start: 0}
+        parent = {start: None}
+        closed = set()
+        frontier = [(h(start), start)]
+        self.expanded = 0
+        while frontier:
+            _, node = heapq.heappop(frontier)
+            if node in closed:
+                continue
+            if node == goal:
+                abstract = []
+                while node:
+                    abstract.append(node)
+                    node = parent[node]
+                return self.refine(abstract[::-1])
+            closed.add(node)
+            self.expanded += 1
+            for nxt, cost in neighbours(node):
+                new_g = g[node] + cost
+                if nxt not in closed and new_g < g.get(nxt, float('inf')):
+                    g[nxt] = new_g
+                    parent[nxt] = node
+                    heapq.heappush(frontier, (new_g + h(nxt), nxt))
+        raise ValueError('No Path Found')
+
+    def refine(self, abstract):
+        """
+        Expand an abstract path into cells, searching only inside one cluster per step
+        """
+        path = [abstract[0]]
+        for a, b in zip(abstract, abstract[1:]):
+            if b in self.links.get(a, ()) and self.cluster_of(a) != self.cluster_of(b):
+                path.append(b)
+                continue
+            cluster = self.cluster_of(a)
+            segments = self.segments.setdefault(cluster, dict())
+            segment = segments.get((a, b))
+            if segment is None:
+                _, parent = self.local_costs(cluster, a, b)
+                segment = []
+                cell = b
+                while cell != a:
+                    segment.append(cell)
+                    cell = parent[cell]
+                segment = segment[::-1]
+                # segments from or to the query's start and goal are not worth keeping
+                if a in self.links and b in self.links:
+                    segments[(a, b)] = segment
+            path.extend(segment)
+        return path
+
+
+def hierarchical_planner(traversable, size=16):
+    """
+    The hierarchical planner of the traversability layer, kept across queries
+    """
+    planner = traversable.hierarchies.get(size)
+    if planner is None:
+        planner = HierarchicalPlanner(traversable, size)
+        traversable.hierarchies[size] = planner
+    return planner
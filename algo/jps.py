@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""Jump point search over cells of the 4-connected grid, for the open parts of the arena
+"""
+import heapq
+
+
+def axis_costs(direction, along=1, across=2):
+    """
+    Cost of one step along each axis as charged by the cell A* of FastestPath:
+    moves parallel to the initial direction cost along, the others across
+
+    Returns:
+        (row step cost, col step cost)
+    """
+    # NORTH and SOUTH are odd, EAST and WEST even
+    return (along, across) if direction % 2 else (across, along)
+
+
+class JumpPointSearch:
+
+    """
+    A* over jump points of the 4-connected grid (the never-diagonal variant of JPS).
+
+    Every ordering of the same straight moves costs the same, so instead of expanding
+    open floor one cell at a time the search jumps along a row or column until it reaches
+    the goal or a cell where a wall next to the line ends (a forced neighbour). Vertical
+    jumps also stop where a horizontal jump from the cell would find a jump point.
+    The paths have the same cost as the ones of the plain cell A*.
+
+    Attributes:
+        traversable: TraversableMap
+            The traversability layer the search runs on
+        costs: tuple
+            (row step cost, col step cost)
+        expanded: int
+            Number of jump points expanded by the last search
+    """
+
+    def __init__(self, traversable, costs=(1, 1)):
+        self.traversable = traversable
+        self.costs = costs
+        self.expanded = 0
+        self.goal = None
+        self.horizontal = dict()
+
+    def walkable(self, r, c):
+        return self.traversable.check_valid((r, c))
+
+    def jump_horizontal(self, r, c, dc):
+        """
+        First jump point met moving from (r, c) along the row in direction dc
+
+        Returns:
+            (row, col) of the jump point, or None
+        """
+        key = (r, c, dc)
+        if key in self.horizontal:
+            return self.horizontal[key]
+        cells = []
+        found = None
+        while self.walkable(r, c):
+            if (r, c) == self.goal or \
+                    (self.walkable(r-1, c) and not self.walkable(r-1, c-dc)) or \
+                    (self.walkable(r+1, c) and not self.walkable(r+1, c-dc)):
+                found = (r, c)
+                break
+            cells.append(c)
+            c += dc
+        # every cell scanned on the way leads to the same jump point
+        for scanned in cells:
+            self.horizontal[(r, scanned, dc)] = found
+        self.horizontal[key] = found
+        return found
+
+    def jump_vertical(self, r, c, dr):
+        """
+        First jump point met moving from (r, c) along the column in direction dr
+
+        Returns:
+            (row, col) of the jump point, or None
+        """
+        while self.walkable(r, c):
+            if (r, c) == self.goal or \
+                    (self.walkable(r, c-1) and not self.walkable(r-dr, c-1)) or \
+                    (self.walkable(r, c+1) and not self.walkable(r-dr, c+1)):
+                return (r, c)
+            if self.jump_horizontal(r, c+1, 1) or self.jump_horizontal(r, c-1, -1):
+                return (r, c)
+            r += dr
+        return None
+
+    def jump(self, cell, step):
+        if step[0]:
+            return self.jump_vertical(cell[0] + step[0], cell[1], step[0])
+        return self.jump_horizontal(cell[0], cell[1] + step[1], step[1])
+
+    def directions(self, cell, parent):
+        """
+        Directions worth jumping to from cell, pruned by the direction it was reached from
+        """
+        if parent is None:
+            return [(-1, 0), (1, 0), (0, -1), (0, 1)]
+        dr = (cell[0] > parent[0]) - (cell[0] < parent[0])
+        dc = (cell[1] > parent[1]) - (cell[1] < parent[1])
+        r, c = cell
+        steps = []
+        if dc:
+            for side in (-1, 1):
+                if self.walkable(r+side, c):
+                    steps.append((side, 0))
+            if self.walkable(r, c+dc):
+                steps.append((0, dc))
+        else:
+            for side in (-1, 1):
+                if self.walkable(r, c+side):
+                    steps.append((0, side))
+            if self.walkable(r+dr, c):
+                steps.append((dr, 0))
+        return steps
+
+    def cost(self, a, b):
+        return self.costs[0] * abs(a[0] - b[0]) + self.costs[1] * abs(a[1] - b[1])
+
+    def search(self, start, goal):
+        """
+        Path from start to goal
+
+        Returns:
+            List of (row, col) from start to goal
+
+        Raises:
+            ValueError if the goal cannot be reached
+        """
+        start, goal = (int(start[0]), int(start[1])), (int(goal[0]), int(goal[1]))
+        self.goal = goal
+        self.horizontal = dict()
+        self.expanded = 0
+        if not (self.walkable(*start) and self.walkable(*goal)):
+            raise ValueError('No Path Found')
+        g = {start: 0}
+        parent = {start: None}
+        closed = set()
+        # heap of (f, order, cell), order breaks ties by insertion
+        frontier = [(self.cost(start, goal), 0, start)]
+        entered = 1
+        while frontier:
+            _, _, cell = heapq.heappop(frontier)
+            if cell in closed:
+                continue
+            if cell == goal:
+                return self.interpolate(parent, goal)
+            closed.add(cell)
+            self.expanded += 1
+            for step in self.directions(cell, parent[cell]):
+                point = self.jump(cell, step)
+                if point is None or point in closed:
+                    continue
+                new_g = g[cell] + self.cost(cell, point)
+                if new_g < g.get(point, float('inf')):
+                    g[point] = new_g
+                    parent[point] = cell
+                    heapq.heappush(frontier, (new_g + self.cost(point, goal), entered, point))
+                    entered += 1
+        raise ValueError('No Path Found')
+
+    @staticmethod
+    def interpolate(parent, cell):
+        """
+        Fill in the cells between consecutive jump points
+        """
+        points = []
+        while cell is not None:
+            points.append(cell)
+            cell = parent[cell]
+        points.reverse()
+        path = [points[0]]
+        for a, b in zip(points, points[1:]):
+            dr = (b[0] > a[0]) - (b[0] < a[0])
+            dc = (b[1] > a[1]) - (b[1] < a[1])
+            r, c = a
+            while (r, c) != b:
+                r, c = r + dr, c + dc
+                path.append((r, c))
+        return path
@@ -4,9 +4,21 @@ import numpy as np
 def map_from_descriptor(hex_str):
         pass
 
+def start_of(shape):
+    """
+    Centre of the start zone (bottom left corner) of an arena with the given (rows, cols)
+    """
+    return np.asarray([shape[0]-2, 1])
+
+def goal_of(shape):
+    """
+    Centre of the goal zone (top right corner) of an arena with the given (rows, cols)
+    """
+    return np.asarray([1, shape[1]-2])
+
 def map_from_file(path):
     with open(path) as f:
         return np.genfromtxt(f, dtype=int, delimiter=1)
 
 def file_from_map(mapdata,path):
-    return np.savetxt(path, mapdata, delimiter=1) 
\ No newline at end of file
+    return np.savetxt(path, mapdata, '%d', delimiter='')
\ No newline at end of file
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Compile paths of cells into robot movements
+"""
+from algo.constants import NORTH, SOUTH, EAST, WEST, FORWARD, LEFT, RIGHT
+from algo.statespace import DELTA, turn_left, turn_right
+
+# heading of a move between adjacent cells, by (row, col) step
+HEADING = {(-1, 0): NORTH, (0, 1): EAST, (1, 0): SOUTH, (0, -1): WEST}
+
+
+def _turns(direction, target):
+    if target == direction:
+        return ()
+    if target == direction % 4 + 1:
+        return (RIGHT,)
+    if direction == target % 4 + 1:
+        return (LEFT,)
+    return (RIGHT, RIGHT)
+
+
+def _headings(direction, moves):
+    headings = []
+    for move in moves:
+        direction = turn_right(direction) if move == RIGHT else turn_left(direction)
+        headings.append(direction)
+    return tuple(headings)
+
+
+# shortest turns from a heading to another, and the heading after each of them
+TURNS = {(d, t): _turns(d, t) for d in (NORTH, EAST, SOUTH, WEST) for t in (NORTH, EAST, SOUTH, WEST)}
+TURN_HEADINGS = {(d, t): _headings(d, moves) for (d, t), moves in TURNS.items()}
+
+
+def turn_to(direction, target):
+    """
+    Shortest list of movements turning the robot from direction to target
+    """
+    return list(TURNS[(direction, target)])
+
+
+def compile_path(path, direction, end_direction=None):
+    """
+    Movements following a path of adjacent cells
+
+    Args:
+        path: List
+            (row, col) of the cells visited, starting at the robot position
+        direction: int
+            The heading of the robot at the start of the path
+        end_direction: int, optional
+            The heading required at the end of the path, any if None
+
+    Returns:
+        (movements, center_directions, direction): the movements, the (center, heading)
+        of the robot after each of them and the final heading
+    """
+    movements = []
+    center_directions = []
+    if len(path) == 0:
+        return movements, center_directions, direction
+    r, c = int(path[0][0]), int(path[0][1])
+    for cell in path[1:]:
+        nr, nc = int(cell[0]), int(cell[1])
+        if (nr, nc) == (r, c):
+            continue
+        target = HEADING[(nr - r, nc - c)]
+        movements.extend(TURNS[(direction, target)])
+        center_directions.extend(((r, c), d) for d in TURN_HEADINGS[(direction, target)])
+        movements.append(FORWARD)
+        center_directions.append(((nr, nc), target))
+        r, c, direction = nr, nc, target
+    if end_direction is not None:
+        movements.extend(TURNS[(direction, end_direction)])
+        center_directions.extend(((r, c), d) for d in TURN_HEADINGS[(direction, end_direction)])
+        direction = end_direction
+    return movements, center_directions, direction
+
+
+def advance(center, direction, movements):
+    """
+    Pose of the robot after executing the movements from (center, direction)
+
+    Returns:
+        ((row, col), direction)
+    """
+    r, c = int(center[0]), int(center[1])
+    for move in movements:
+        if move == FORWARD:
+            r, c = r + DELTA[direction][0], c + DELTA[direction][1]
+        elif move == RIGHT:
+            direction = turn_right(direction)
+        else:
+            direction = turn_left(direction)
+    return (r, c), direction
+
+
+def encode(movements):
+    """
+    Movements as sent to the robot, consecutive forwards merged into runs ('F3')
+    """
+    encoded = []
+    run = 0
+    for move in movements:
+        if move == FORWARD:
+            run += 1
+            continue
+        if run:
+            encoded.append(FORWARD + str(run))
+            run = 0
+        encoded.append(move)
+    if run:
+        encoded.append(FORWARD + str(run))
+    return ''.join(encoded)
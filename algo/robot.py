@@ -3,13 +3,12 @@ import numpy as np
 from algo.constants import *
 from algo.exploration import Exploration
 from algo.mapmethod import map_from_file
+from algo.costmodel import MotionProfile
+from algo.geometry import pose_table
+from algo.movement import turn_to
+from algo.traversable import TraversableMap
 import time
 
-def send(string):
-    time.sleep(0.1)
-
-def receive():
-    time.sleep(0.1)
 
 class Robot:
 
@@ -22,25 +21,40 @@ class Robot:
         current_map: Numpy array
         The current map known by the robot
 
+        traversable: TraversableMap
+        Traversability layer of current_map, shared with Exploration and FastestPath
+
         direction: int
         NORTH = 1
         EAST = 2
         SOUTH = 3
         WEST = 4
 
+        clock: module or VirtualClock
+        What the robot and its exploration tell the time and wait with
+
+        latency: float
+        Seconds a message to the robot is known to take, 0 if unknown
+
+        geometry: PoseTable
+        Cells around every pose of the arena, shared by all robots on arenas of its shape
+
     """
 
-    def __init__(self, direction, start_location, update_frontend=None):
+    def __init__(self, direction, start_location, update_frontend=None, shape=(MAX_ROWS, MAX_COLS)):
         """
         Constructor:
 
         Args:
             start_location: Numpy Array
+            shape: tuple
+                (rows, cols) of the arena
         """
         self.direction = direction
         self.center = start_location
-        self.current_map = np.zeros([20, 15])
+        self.current_map = np.zeros(shape)
         self.mark_neighborhood(start_location, 1)
+        self.traversable = TraversableMap(self.current_map)
         self.head = None
         if direction == NORTH:
             self.head = start_location + [-1, 0]
@@ -52,6 +66,9 @@ class Robot:
             self.head = start_location + [-1, 0]
 
         self.update_frontend = update_frontend
+        self.clock = time
+        self.latency = 0.0
+        self.geometry = pose_table(shape)
 
     def update_map(self):
         """
@@ -59,6 +76,38 @@ class Robot:
         """
         pass
 
+    def get_sensor_grids(self, center=None, direction=None):
+        """
+        The cells the six sensors (in clockwise direction from front left) would detect,
+        nearest first, up to the edge of the map
+
+        Args:
+            center, direction: optional
+                The pose to sense from, the robot's own pose if None
+
+        Returns:
+           the indices (tuple of tuples of (row, col))
+        """
+        r, c = self.center if center is None else center
+        direction = self.direction if direction is None else direction
+        return self.geometry.sensors(int(r), int(c), direction)
+
+    def sense(self, readings):
+        """
+        Update the current map with sensor readings taken from the current pose
+
+        Args:
+            readings: list
+                Number of free cells seen by each sensor, in the order of get_sensor_grids.
+                The cell after them is an obstacle
+        """
+        for blocks_empty, each in zip(readings, self.get_sensor_grids()):
+            for i, cell in enumerate(each):
+                if i >= blocks_empty:
+                    self.current_map[cell] = 2
+                    break
+                self.current_map[cell] = 1
+
     def mark_neighborhood(self, center, value):
         """
         To mark a 3x3 neighbourhood around the center location with a user defined value
@@ -67,7 +116,7 @@ class Robot:
                          2, center[1]-1:center[1]+2] = value
 
     def compute_coverage(self):
-        return np.count_nonzero(self.current_map) / (15*20)
+        return np.count_nonzero(self.current_map) / self.current_map.size
 
 
 class SimuRobot(Robot):
@@ -75,142 +124,78 @@ class SimuRobot(Robot):
     child class SimuRobot extends Robot, is for simulation.
     '''
 
-    def __init__(self, direction, start_location, simu_map, update_frontend=None,send=send, receive=receive):
-        super().__init__(direction, start_location, update_frontend)
+    def __init__(self, direction, start_location, simu_map, update_frontend=None, send=None, receive=None,
+                 clock=time, profile=None):
+        """
+        Constructor
+
+        Args:
+            update_frontend: function, optional
+                Called with the map and pose after every sensing, headless if None
+            send, receive: function, optional
+                Link to the robot, stubs taking the time of a message if None
+            clock: module or VirtualClock, optional
+                A VirtualClock runs the simulation at full speed, charging the delays
+                of the robot to the clock instead of waiting for them
+            profile: MotionProfile, optional
+                Time the movements take, the default profile if None. Give it the profile
+                of the Exploration, which reserves time by the same predictions
+        """
+        super().__init__(direction, start_location, update_frontend, simu_map.shape)
         self.simu_map = simu_map
         self.update_frontend = update_frontend
+        self.clock = clock
+        self.profile = profile if profile is not None else MotionProfile()
         self.update_map()
-        self.send = send
-        self.receive = receive
+        if send is None:
+            self.latency = 0.1
+        self.send = send if send is not None else self.stub_send
+        self.receive = receive if receive is not None else lambda: clock.sleep(self.latency)
 
-    def get_sensor_grids(self):
+    def stub_send(self, msg):
         """
-        generate the indices which the six sensors ( in clockwise direction from front left) would detect
-
-        Returns:
-           the indices (list of list)
+        Without a link to a robot, a message takes the time it would on one, and a list of
+        movements sent in one go the time to drive them
         """
-        short_range = 2
-        long_range = 4
-        r, c = self.center
-        grids = []
-
-        # Front Left
-        if self.direction == NORTH:
-            idxs = list(zip(range(r-short_range-1, r-1),
-                            [c-1]*short_range))[::-1]
-            grids.append(idxs)
-        elif self.direction == EAST:
-            idxs = list(zip([r-1]*short_range, range(c+2, c+short_range+2)))
-            grids.append(idxs)
-        elif self.direction == WEST:
-            idxs = list(
-                zip([r+1]*short_range, range(c-short_range-1, c-1)))[::-1]
-            grids.append(idxs)
-        else:
-            idxs = list(zip(range(r+2, r+short_range+2), [c+1]*short_range))
-            grids.append(idxs)
-
-        # Front Center
-        if self.direction == NORTH:
-            idxs = list(
-                zip(range(r-short_range-1, r-1), [c]*short_range))[::-1]
-            grids.append(idxs)
-        elif self.direction == EAST:
-            idxs = list(zip([r]*short_range, range(c+2, c+short_range+2)))
-            grids.append(idxs)
-
-        elif self.direction == WEST:
-            idxs = list(
-                zip([r]*short_range, range(c-short_range-1, c-1)))[::-1]
-            grids.append(idxs)
-        else:
-            idxs = list(zip(range(r+2, r+short_range+2), [c]*short_range))
-            grids.append(idxs)
-
-        # Front Right
-        if self.direction == NORTH:
-            idxs = list(zip(range(r-short_range-1, r-1),
-                            [c+1]*short_range))[::-1]
-            grids.append(idxs)
-        elif self.direction == EAST:
-            idxs = list(zip([r+1]*short_range, range(c+2, c+short_range+2)))
-            grids.append(idxs)
-        elif self.direction == WEST:
-            idxs = list(
-                zip([r-1]*short_range, range(c-short_range-1, c-1)))[::-1]
-            grids.append(idxs)
-        else:
-            idxs = list(zip(range(r+2, r+short_range+2), [c-1]*short_range))
-            grids.append(idxs)
-
-        # Right Top
-        if self.direction == NORTH:
-            idxs = list(zip([r-1]*long_range, range(c+2, c+long_range+2)))
-            grids.append(idxs)
-        elif self.direction == EAST:
-            idxs = list(zip(range(r+2, r+long_range+2), [c+1]*long_range))
-            grids.append(idxs)
-        elif self.direction == WEST:
-            idxs = list(zip(range(r-long_range-1, r-1),
-                            [c-1]*long_range))[::-1]
-            grids.append(idxs)
-        else:
-            idxs = list(
-                zip([r+1]*long_range, range(c-long_range-1, c-1)))[::-1]
-            grids.append(idxs)
-
-        # Left Bottom
-        if self.direction == NORTH:
-            idxs = list(
-                zip([r+1]*short_range, range(c-short_range-1, c-1)))[::-1]
-            grids.append(idxs)
-        elif self.direction == EAST:
-            idxs = list(zip(range(r-short_range-1, r-1),
-                            [c-1]*short_range))[::-1]
-            grids.append(idxs)
-        elif self.direction == WEST:
-            idxs = list(zip(range(r+2, r+short_range+2), [c+1]*short_range))
-            grids.append(idxs)
-        else:
-            idxs = list(zip([r+1]*short_range, range(c+2, c+short_range+2)))
-            grids.append(idxs)
-
-        # Left Top
-        if self.direction == NORTH:
-            idxs = list(
-                zip([r-1]*short_range, range(c-short_range-1, c-1)))[::-1]
-            grids.append(idxs)
-        elif self.direction == EAST:
-            idxs = list(zip(range(r-short_range-1, r-1),
-                            [c+1]*short_range))[::-1]
-            grids.append(idxs)
-        elif self.direction == WEST:
-            idxs = list(zip(range(r+2, r+short_range+2), [c-1]*short_range))
-            grids.append(idxs)
-        else:
-            idxs = list(zip([r-1]*short_range, range(c+2, c+short_range+2)))
-            grids.append(idxs)
-
-        return grids
+        seconds = self.latency
+        if isinstance(msg, list):
+            seconds += self.profile.predict(msg)
+        self.clock.sleep(seconds)
 
     def update_map(self):
         """
         simulate sensor data from simu_map, and update the current map known by the robot
         """
-        grids = self.get_sensor_grids()
-        for each in grids:
-            for (r, c) in each:
-                if (0 <= r < MAX_ROWS) and (0 <= c < MAX_COLS):
-                    if self.simu_map[r][c] == 2:
-                        if self.current_map[r][c] == 0:
-                            self.current_map[r][c] = 2
-                        break
-                    else:
-                        if self.current_map[r][c] == 0:
-                            self.current_map[r][c] = 1
-        self.update_frontend(self.current_map, self.center,self.cal_head())
-    
+        for each in self.get_sensor_grids():
+            for cell in each:
+                if self.simu_map[cell] == 2:
+                    if self.current_map[cell] == 0:
+                        self.current_map[cell] = 2
+                    break
+                elif self.current_map[cell] == 0:
+                    self.current_map[cell] = 1
+        if self.update_frontend:
+            self.update_frontend(self.current_map, self.center, self.cal_head())
+
+    def readings(self, center=None, direction=None):
+        """
+        Sensor readings from simu_map, as the real robot reports them: the number of free
+        cells each sensor sees before an obstacle or the edge of the map
+
+        Args:
+            center, direction: optional
+                The pose to sense from, the robot's own pose if None
+        """
+        readings = []
+        for each in self.get_sensor_grids(center, direction):
+            blocks_empty = 0
+            for cell in each:
+                if self.simu_map[cell] == 2:
+                    break
+                blocks_empty += 1
+            readings.append(blocks_empty)
+        return readings
+
     def cal_head(self):
         if self.direction == NORTH:
             head = self.center + [-1, 0]
@@ -261,7 +246,7 @@ class SimuRobot(Robot):
                 self.center = self.center + [0, -1]
                 self.mark_neighborhood(self.center, 1)
 
-        time.sleep(0.1)
+        self.clock.sleep(self.profile.predict([movement]))
 
     def execute_nosend(self, movement: str):
         """
@@ -311,16 +296,11 @@ class SimuRobot(Robot):
         else:
             self.head = self.center + [0, 1]
 
-    def correct_direction(self,target_direction):
-        movement = []
-        if self.direction == NORTH:
-            movement.append(LEFT)
-        elif self.direction == EAST:
-            movement.extend([LEFT,LEFT])
-        elif self.direction == SOUTH:
-            movement.append(RIGHT)
-        
-        return movement
+    def correct_direction(self, target_direction):
+        """
+        Shortest list of movements turning the robot to target_direction
+        """
+        return turn_to(self.direction, target_direction)
 
 
 class RealRobot(Robot):
@@ -328,8 +308,8 @@ class RealRobot(Robot):
     child class RealRobot extends Robot, is for the real execution.
     '''
 
-    def __init__(self, direction, start_location, send, receive, update_frontend):
-        super().__init__(direction, start_location, update_frontend)
+    def __init__(self, direction, start_location, send, receive, update_frontend, shape=(MAX_ROWS, MAX_COLS)):
+        super().__init__(direction, start_location, update_frontend, shape)
         self.mark_neighborhood(start_location, 1)
         self.send = send
         self.receive = receive
@@ -454,116 +434,6 @@ class RealRobot(Robot):
     #     else:
     #         self.getValue(list(zip([r+1]*distanceShort, range(c+2, c+distanceShort+2))),
     #                       sensor_vals[5], distanceShort, False)
-    def get_sensor_grids(self):
-        """
-        generate the indices which the six sensors ( in clockwise direction from front left) would detect
-
-        Returns:
-           the indices (list of list)
-        """
-        short_range = 2
-        long_range = 4
-        r, c = self.center
-        grids = []
-
-        # Front Left
-        if self.direction == NORTH:
-            idxs = list(zip(range(r-short_range-1, r-1),
-                            [c-1]*short_range))[::-1]
-            grids.append(idxs)
-        elif self.direction == EAST:
-            idxs = list(zip([r-1]*short_range, range(c+2, c+short_range+2)))
-            grids.append(idxs)
-        elif self.direction == WEST:
-            idxs = list(
-                zip([r+1]*short_range, range(c-short_range-1, c-1)))[::-1]
-            grids.append(idxs)
-        else:
-            idxs = list(zip(range(r+2, r+short_range+2), [c+1]*short_range))
-            grids.append(idxs)
-
-        # Front Center
-        if self.direction == NORTH:
-            idxs = list(
-                zip(range(r-short_range-1, r-1), [c]*short_range))[::-1]
-            grids.append(idxs)
-        elif self.direction == EAST:
-            idxs = list(zip([r]*short_range, range(c+2, c+short_range+2)))
-            grids.append(idxs)
-
-        elif self.direction == WEST:
-            idxs = list(
-                zip([r]*short_range, range(c-short_range-1, c-1)))[::-1]
-            grids.append(idxs)
-        else:
-            idxs = list(zip(range(r+2, r+short_range+2), [c]*short_range))
-            grids.append(idxs)
-
-        # Front Right
-        if self.direction == NORTH:
-            idxs = list(zip(range(r-short_range-1, r-1),
-                            [c+1]*short_range))[::-1]
-            grids.append(idxs)
-        elif self.direction == EAST:
-            idxs = list(zip([r+1]*short_range, range(c+2, c+short_range+2)))
-            grids.append(idxs)
-        elif self.direction == WEST:
-            idxs = list(
-                zip([r-1]*short_range, range(c-short_range-1, c-1)))[::-1]
-            grids.append(idxs)
-        else:
-            idxs = list(zip(range(r+2, r+short_range+2), [c-1]*short_range))
-            grids.append(idxs)
-
-        # Right Top
-        if self.direction == NORTH:
-            idxs = list(zip([r-1]*long_range, range(c+2, c+long_range+2)))
-            grids.append(idxs)
-        elif self.direction == EAST:
-            idxs = list(zip(range(r+2, r+long_range+2), [c+1]*long_range))
-            grids.append(idxs)
-        elif self.direction == WEST:
-            idxs = list(zip(range(r-long_range-1, r-1),
-                            [c-1]*long_range))[::-1]
-            grids.append(idxs)
-        else:
-            idxs = list(
-                zip([r+1]*long_range, range(c-long_range-1, c-1)))[::-1]
-            grids.append(idxs)
-
-        # Left Bottom
-        if self.direction == NORTH:
-            idxs = list(
-                zip([r+1]*short_range, range(c-short_range-1, c-1)))[::-1]
-            grids.append(idxs)
-        elif self.direction == EAST:
-            idxs = list(zip(range(r-short_range-1, r-1),
-                            [c-1]*short_range))[::-1]
-            grids.append(idxs)
-        elif self.direction == WEST:
-            idxs = list(zip(range(r+2, r+short_range+2), [c+1]*short_range))
-            grids.append(idxs)
-        else:
-            idxs = list(zip([r-1]*short_range, range(c+2, c+short_range+2)))
-            grids.append(idxs)
-
-        # Left Top
-        if self.direction == NORTH:
-            idxs = list(
-                zip([r-1]*short_range, range(c-short_range-1, c-1)))[::-1]
-            grids.append(idxs)
-        elif self.direction == EAST:
-            idxs = list(zip(range(r-short_range-1, r-1),
-                            [c+1]*short_range))[::-1]
-            grids.append(idxs)
-        elif self.direction == WEST:
-            idxs = list(zip(range(r+2, r+short_range+2), [c-1]*short_range))
-            grids.append(idxs)
-        else:
-            idxs = list(zip([r+1]*short_range, range(c+2, c+short_range+2)))
-            grids.append(idxs)
-
-        return grids
 
     def update_map(self):
         msg = self.receive()
@@ -571,22 +441,7 @@ class RealRobot(Robot):
         if (split_data[0] == 'Explore'):
             print(list(split_data[1])[:6])
             sensors = list(map(float, list(split_data[1])[:6]))
-            
-            grids = self.get_sensor_grids()
-            print(grids)
-            for idx, each in enumerate(grids):
-                blocks_empty = sensors[idx]
-                for i in range(len(each)):
-                    (r, c) = each[i]
-                    if (0 <= r < MAX_ROWS) and (0 <= c < MAX_COLS):
-                        if i >= blocks_empty:
-                            # if self.current_map[r][c] == 0:
-                            self.current_map[r][c] = 2
-                            break
-                        else:
-                            # if self.current_map[r][c] == 0:
-                            self.current_map[r][c] = 1
-
+            self.sense(sensors)
             print(self.cal_head())
             self.update_frontend(self.current_map, self.center,
                                  self.cal_head())
@@ -603,7 +458,7 @@ class RealRobot(Robot):
         return head
 
     def descriptor_1(self):
-        descriptor = np.zeros([20, 15]).astype(int)
+        descriptor = np.zeros(self.current_map.shape).astype(int)
         descriptor[self.current_map[::-1, :] != 0] = 1
         bits = '11'
         for row in descriptor:
@@ -678,16 +533,11 @@ class RealRobot(Robot):
         # if self.update_frontend:
         #     self.update_frontend(self.current_map, self.center, self.head)
 
-    def correct_direction(self,target_direction):
-        movement = []
-        if self.direction == NORTH:
-            movement.append(LEFT)
-        elif self.direction == EAST:
-            movement.extend([LEFT,LEFT])
-        elif self.direction == SOUTH:
-            movement.append(RIGHT)
-        
-        return movement
+    def correct_direction(self, target_direction):
+        """
+        Shortest list of movements turning the robot to target_direction
+        """
+        return turn_to(self.direction, target_direction)
 
 
     def execute_nosend(self, movement: str):
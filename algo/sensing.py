@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""Information gain of every robot pose, scored over the whole map at once
+"""
+import numpy as np
+
+from algo.constants import NORTH, EAST, SOUTH, WEST
+from algo.geometry import SENSORS, REACH, LENGTH
+
+# rays are padded to LENGTH, which of the padded ray cells are real, by [step, heading-1, sensor]
+RAY_CELLS = np.array([[[step < len(ray) for ray in SENSORS[d]] for d in (NORTH, EAST, SOUTH, WEST)]
+                      for step in range(LENGTH)])
+
+# per map shape: the padded map to fill and the flat indices into it of every sensed cell
+_buffers = dict()
+
+
+def ray_indices(shape):
+    """
+    The padded map buffer and the flat indices into it of every sensed cell, by
+    [step, pose, heading-1, sensor], built once per map shape
+    """
+    if shape not in _buffers:
+        rows, cols = shape
+        width = cols + 2 * REACH
+        # the edge of the map blocks the sensors like an obstacle
+        padded = np.full((rows + 2 * REACH, width), 2, dtype=np.int8)
+        offsets = np.array([[[ray[min(step, len(ray)-1)][0] * width + ray[min(step, len(ray)-1)][1]
+                              for ray in SENSORS[d]] for d in (NORTH, EAST, SOUTH, WEST)]
+                            for step in range(LENGTH)])
+        r, c = np.meshgrid(np.arange(rows) + REACH, np.arange(cols) + REACH, indexing='ij')
+        centres = (r * width + c).ravel()
+        _buffers[shape] = padded, offsets[:, None] + centres[None, :, None, None]
+    return _buffers[shape]
+
+
+def information_gain(current_map, mask=None):
+    """
+    Number of unknown cells the sensors would reveal from every pose. A ray stops at the first
+    known obstacle or at the edge of the map, unknown cells are assumed to let it through.
+
+    Args:
+        current_map: np array
+            The map known by the robot (0 unknown, 1 free, 2 obstacle)
+        mask: np array of bool, optional
+            Poses allowed (the traversability mask), every pose if None
+
+    Returns:
+        np array gain[r, c, heading-1], 0 for poses outside mask
+    """
+    rows, cols = current_map.shape
+    padded, indices = ray_indices(current_map.shape)
+    padded[REACH:REACH+rows, REACH:REACH+cols] = current_map
+    cells = padded.ravel()[indices]
+    unknown = (cells == 0) & RAY_CELLS[:, None]
+    # walk all the rays at once, a step at a time, until they meet an obstacle
+    clear = cells[0] != 2
+    seen = unknown[0].astype(np.int8)
+    for step in range(1, LENGTH):
+        seen += unknown[step] & clear
+        clear &= cells[step] != 2
+    gain = seen.sum(axis=2).reshape(rows, cols, 4)
+    if mask is not None:
+        gain[~mask] = 0
+    return gain
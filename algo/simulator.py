@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""Discrete-event simulation of runs on the robot, to predict how long they take on the floor
+"""
+import heapq
+import time
+import numpy as np
+
+from algo.constants import NORTH, EXPLORE_NEIGHBOURS
+from algo.clock import VirtualClock
+from algo.costmodel import MotionProfile
+from algo.exploration import Exploration, RETURN_PAUSE
+from algo.fastest import FastestPath
+from algo.mapmethod import start_of, goal_of
+from algo.movement import advance
+from algo.robot import SimuRobot
+
+# what the time of a run goes to
+MOTION = 'motion'
+SENSING = 'sensing'
+LINK = 'link'
+COMPUTE = 'compute'
+PAUSE = 'pause'
+KINDS = (MOTION, SENSING, LINK, COMPUTE, PAUSE)
+
+
+class TimingModel:
+
+    """
+    Time taken by the parts of a run on the robot, besides the algorithm itself.
+
+    Attributes:
+        profile: MotionProfile
+            Motor time of the movements
+        sense_time: float
+            Seconds to take the sensor readings after a movement
+        latency: float
+            Seconds for a message to go one way between the algorithm and the robot,
+            through the RPi
+        compute_factor: float
+            How much slower the algorithm runs on the robot than where it is simulated,
+            its time is left out if 0
+    """
+
+    def __init__(self, profile=None, sense_time=0.2, latency=0.05, compute_factor=1.0):
+        self.profile = profile if profile is not None else MotionProfile()
+        self.sense_time = sense_time
+        self.latency = latency
+        self.compute_factor = compute_factor
+
+    def overhead(self, compute=0.0):
+        """
+        Seconds an exploration movement takes besides its motion: sending it, the reply,
+        the sensing and deciding the next movement in compute seconds
+        """
+        return 2 * self.latency + self.sense_time + compute
+
+    def return_overhead(self, compute=0.0):
+        """
+        Seconds the return to the start zone takes besides its motion and pause: the end
+        of exploration sent, the movements sent in one go and the reply, deciding to return
+        and planning the path in compute seconds each
+        """
+        return 3 * self.latency + 2 * compute
+
+
+class Simulator:
+
+    """
+    Runs exploration and fastest path on a simulated timeline. Every message, movement,
+    sensing and decision is an event taking the time of the timing model, and events
+    happen in the order of their times.
+
+    Attributes:
+        simu_map: np array
+            The arena (1 free, 2 obstacle)
+        timing: TimingModel
+            Time taken by each event
+        clock: VirtualClock
+            The simulated time, which the robot and exploration run on
+        log: list
+            (start, end, kind, detail) of every event that happened, in order
+    """
+
+    def __init__(self, simu_map, timing=None):
+        self.simu_map = simu_map
+        self.timing = timing if timing is not None else TimingModel()
+        self.clock = VirtualClock()
+        self.queue = []
+        self.counter = 0
+        self.log = []
+        # longest decision so far, in seconds on the robot
+        self.compute = 0.0
+
+    def schedule(self, seconds, kind, then=None, detail=''):
+        """
+        Start an event of kind lasting seconds now, and call then() when it ends
+        """
+        now = self.clock.time()
+        self.counter += 1
+        heapq.heappush(self.queue, (now + seconds, self.counter, now, kind, detail, then))
+
+    def run(self):
+        """
+        Process the events in time order until none is left
+
+        Returns:
+            The simulated time at the end
+        """
+        while self.queue:
+            end, _, start, kind, detail, then = heapq.heappop(self.queue)
+            self.clock.now = end
+            self.log.append((start, end, kind, detail))
+            if then is not None:
+                then()
+        return self.clock.time()
+
+    def decide(self, func, then):
+        """
+        Run a step of the algorithm, then(result) once the time it took on the robot has passed
+        """
+        t = time.perf_counter()
+        result = func()
+        seconds = (time.perf_counter() - t) * self.timing.compute_factor
+        self.compute = max(self.compute, seconds)
+        self.schedule(seconds, COMPUTE, lambda: then(result))
+
+    def send(self, movements, then):
+        """
+        Send movements to the robot, which executes them in one go and replies
+        """
+        latency = self.timing.latency
+        detail = ''.join(movements)
+        self.schedule(latency, LINK, lambda: self.schedule(
+            self.timing.profile.predict(movements), MOTION,
+            lambda: self.schedule(latency, LINK, then), detail), detail)
+
+    def explore(self, time_limit=None, coverage=None, strategy=EXPLORE_NEIGHBOURS):
+        """
+        Simulate an exploration from the start zone: each movement is sent on its own and the
+        robot replies with its sensor readings, then it returns to the start zone in one go.
+        The exploration reserves the time of the messages, sensing and decisions as well as
+        the motion, each decision up to twice as long as the longest one so far
+
+        Returns:
+            The Exploration, its robot holds the map and pose at the end
+        """
+        shape = self.simu_map.shape
+        robot = SimuRobot(NORTH, start_of(shape), self.simu_map, clock=self.clock,
+                          profile=self.timing.profile)
+        exploration = Exploration(robot, time_limit, coverage, profile=self.timing.profile,
+                                  strategy=strategy, overhead=self.timing.overhead(),
+                                  return_overhead=self.timing.return_overhead(), verbose=False)
+        end_time = self.clock.time() + time_limit if time_limit else None
+        steps = exploration.steps(end_time)
+
+        def resume(readings=None):
+            # the next step, or None and whether to return to the start zone
+            # decisions get slower as the map fills in, leave them room
+            exploration.overhead = self.timing.overhead(2 * self.compute)
+            exploration.return_overhead = self.timing.return_overhead(2 * self.compute)
+            try:
+                return steps.send(readings), None
+            except StopIteration as stop:
+                return None, stop.value
+
+        def act(result):
+            step, returning = result
+            if step is None:
+                if returning:
+                    self.schedule(self.timing.latency, LINK, lambda: self.schedule(
+                        RETURN_PAUSE, PAUSE, lambda: self.decide(exploration.return_movements, home)))
+                return
+            move, _ = step
+            # the readings the robot takes where the movement leaves it
+            readings = robot.readings(*advance(robot.center, robot.direction, [move]))
+            self.send([move], lambda: self.schedule(
+                self.timing.sense_time, SENSING,
+                lambda: self.decide(lambda: resume(readings), act)))
+
+        def home(movements):
+            def arrive():
+                for move in movements:
+                    robot.execute_nosend(move)
+            self.send(movements, arrive)
+
+        self.decide(resume, act)
+        self.run()
+        return exploration
+
+    def fastest(self, waypoint=np.array([]), **options):
+        """
+        Simulate a fastest path run from the start zone to the goal zone of the arena,
+        sent to the robot in one go
+
+        Args:
+            options:
+                Keyword arguments of FastestPath (mode, ...)
+
+        Returns:
+            The FastestPath
+        """
+        shape = self.simu_map.shape
+        options.setdefault('profile', self.timing.profile)
+        fsp = FastestPath(self.simu_map, start_of(shape), goal_of(shape), NORTH, waypoint, **options)
+        self.decide(fsp.run, lambda _: self.send(fsp.movements, None))
+        self.run()
+        return fsp
+
+    def report(self):
+        """
+        Where the time went
+
+        Returns:
+            dict of the seconds spent by kind, and the total under 'total'
+        """
+        spent = dict.fromkeys(KINDS, 0.0)
+        for start, end, kind, _ in self.log:
+            spent[kind] += end - start
+        spent['total'] = self.clock.time()
+        return spent
@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""Search over robot poses (row, col, heading) with explicit turn and forward costs
+"""
+import heapq
+
+from algo.constants import NORTH, SOUTH, EAST, WEST, FORWARD, LEFT, RIGHT, FORWARD_COST, TURN_COST
+
+# (row, col) step of a forward move for each heading
+DELTA = {NORTH: (-1, 0), EAST: (0, 1), SOUTH: (1, 0), WEST: (0, -1)}
+
+
+def turn_left(direction):
+    return (direction - 2) % 4 + 1
+
+
+def turn_right(direction):
+    return direction % 4 + 1
+
+
+def opposite(direction):
+    return (direction + 1) % 4 + 1
+
+
+def turns_needed(coord, direction, goal):
+    """
+    Lower bound on the number of 90 degree turns needed to reach goal from the pose
+
+    Returns:
+        int (0, 1 or 2)
+    """
+    dr, dc = goal[0] - coord[0], goal[1] - coord[1]
+    need = set()
+    if dr < 0:
+        need.add(NORTH)
+    elif dr > 0:
+        need.add(SOUTH)
+    if dc > 0:
+        need.add(EAST)
+    elif dc < 0:
+        need.add(WEST)
+    if not need:
+        return 0
+    if len(need) == 1:
+        if direction in need:
+            return 0
+        return 2 if opposite(direction) in need else 1
+    return 1 if direction in need else 2
+
+
+def heuristic(coord, direction, goal, forward_cost=FORWARD_COST, turn_cost=TURN_COST):
+    """
+    Admissible and consistent estimate of the cost from the pose to goal:
+    Manhattan distance plus the turns the robot cannot avoid
+    """
+    distance = abs(goal[0] - coord[0]) + abs(goal[1] - coord[1])
+    return forward_cost * distance + turn_cost * turns_needed(coord, direction, goal)
+
+
+def successors(traversable, state, forward_cost=FORWARD_COST, turn_cost=TURN_COST):
+    """
+    Poses reachable from state with a single movement
+
+    Returns:
+        List of (state, cost, movement)
+    """
+    r, c, d = state
+    nexts = [((r, c, turn_left(d)), turn_cost, LEFT),
+             ((r, c, turn_right(d)), turn_cost, RIGHT)]
+    dr, dc = DELTA[d]
+    if traversable.check_valid((r+dr, c+dc)):
+        nexts.append(((r+dr, c+dc, d), forward_cost, FORWARD))
+    return nexts
+
+
+def astar(traversable, start, direction, goal, forward_cost=FORWARD_COST, turn_cost=TURN_COST, penalty=None):
+    """
+    A* over (row, col, heading) from the start pose to any heading at the goal cell
+
+    Args:
+        traversable: TraversableMap
+        start: List
+            Coordinates of the starting position
+        direction: int
+            The starting direction of the robot
+        goal: List
+            Coordinates of the goal cell
+        penalty: dict, optional
+            Extra cost of moving into a cell, keyed by (row, col)
+
+    Returns:
+        (states, expanded): the list of (row, col, heading) from start to goal
+        and the number of expanded states
+
+    Raises:
+        ValueError if the goal cannot be reached
+    """
+    goal = (int(goal[0]), int(goal[1]))
+    start = (int(start[0]), int(start[1]), direction)
+    g = {start: 0}
+    parent = {start: None}
+    closed = set()
+    counter = 0
+    # ties on f are broken towards the deeper state
+    frontier = [(heuristic(start[:2], direction, goal, forward_cost, turn_cost), 0, counter, start)]
+    while frontier:
+        _, neg_g, _, state = heapq.heappop(frontier)
+        if state in closed or -neg_g != g[state]:
+            continue
+        if state[:2] == goal:
+            return trace(parent, state), len(closed)
+        closed.add(state)
+        for nxt, cost, move in successors(traversable, state, forward_cost, turn_cost):
+            if nxt in closed:
+                continue
+            new_g = g[state] + cost
+            if penalty and move == FORWARD:
+                new_g += penalty.get(nxt[:2], 0)
+            if new_g < g.get(nxt, float('inf')):
+                g[nxt] = new_g
+                parent[nxt] = state
+                counter += 1
+                h = heuristic(nxt[:2], nxt[2], goal, forward_cost, turn_cost)
+                heapq.heappush(frontier, (new_g + h, -new_g, counter, nxt))
+    raise ValueError('No Path Found')
+
+
+def predecessors(traversable, state, forward_cost=FORWARD_COST, turn_cost=TURN_COST):
+    """
+    Poses from which a single movement leads to state
+
+    Returns:
+        List of (state, cost)
+    """
+    r, c, d = state
+    prevs = [((r, c, turn_right(d)), turn_cost), ((r, c, turn_left(d)), turn_cost)]
+    dr, dc = DELTA[d]
+    if traversable.check_valid((r-dr, c-dc)):
+        prevs.append(((r-dr, c-dc, d), forward_cost))
+    return prevs
+
+
+def bidirectional(traversable, start, direction, goal, forward_cost=FORWARD_COST, turn_cost=TURN_COST):
+    """
+    Search from the start pose and from every heading at the goal cell at once, meeting in the
+    middle.
+
+    Both searches are guided by the average of the heading heuristic towards the goal and the
+    one towards the start (on the path driven in reverse), so they share a consistent potential
+    and can stop as soon as their frontiers together cannot beat the best meeting. The side
+    with fewer open states is expanded, ties on the key going to the deeper state as in astar.
+
+    Each side only gets half of its heuristic, so where the heuristic alone already leads A*
+    close to the goal (the 20x15 stock maps, floors with few obstacles) this expands more
+    than astar, up to about twice as many states. It pays off in large cluttered arenas,
+    where it expands a third to a half of what astar does.
+
+    Returns:
+        (states, expanded): the list of (row, col, heading) from start to goal
+        and the number of states expanded by both searches
+
+    Raises:
+        ValueError if the goal cannot be reached
+    """
+    goal = (int(goal[0]), int(goal[1]))
+    start = (int(start[0]), int(start[1]), direction)
+    if not traversable.check_valid(goal):
+        raise ValueError('No Path Found')
+
+    def potential(state):
+        to_goal = heuristic(state[:2], state[2], goal, forward_cost, turn_cost)
+        # the path to state, driven backwards, leaves it facing the opposite way
+        to_start = heuristic(state[:2], opposite(state[2]), start[:2], forward_cost, turn_cost)
+        return (to_goal - to_start) / 2
+
+    # forward and backward searches: g, links towards the root, closed set and frontier
+    roots = ([start], [(goal[0], goal[1], d) for d in (NORTH, EAST, SOUTH, WEST)])
+    sides = []
+    counter = 0
+    for sign, side_roots in zip((1, -1), roots):
+        frontier = [(sign * potential(root), 0, 0, root) for root in side_roots]
+        heapq.heapify(frontier)
+        sides.append(({root: 0 for root in side_roots}, {root: None for root in side_roots},
+                      set(), frontier, sign))
+    best, meet = float('inf'), None
+    if start[:2] == goal:
+        best, meet = 0, start
+    expanded = 0
+    while sides[0][3] and sides[1][3]:
+        if sides[0][3][0][0] + sides[1][3][0][0] >= best:
+            break
+        # expand the side with fewer open states (reached but not expanded)
+        side = 0 if len(sides[0][0]) - len(sides[0][2]) <= len(sides[1][0]) - len(sides[1][2]) else 1
+        g, link, closed, frontier, sign = sides[side]
+        other_g = sides[1 - side][0]
+        state = heapq.heappop(frontier)[-1]
+        if state in closed:
+            continue
+        closed.add(state)
+        expanded += 1
+        if side == 0:
+            nexts = [(nxt, cost) for nxt, cost, _ in successors(traversable, state, forward_cost, turn_cost)]
+        else:
+            nexts = predecessors(traversable, state, forward_cost, turn_cost)
+        for nxt, cost in nexts:
+            new_g = g[state] + cost
+            if new_g < g.get(nxt, float('inf')):
+                g[nxt] = new_g
+                link[nxt] = state
+                counter += 1
+                heapq.heappush(frontier, (new_g + sign * potential(nxt), -new_g, counter, nxt))
+                if nxt in other_g and new_g + other_g[nxt] < best:
+                    best, meet = new_g + other_g[nxt], nxt
+    if meet is None:
+        raise ValueError('No Path Found')
+    states = trace(sides[0][1], meet)
+    state = sides[1][1][meet]
+    while state:
+        states.append(state)
+        state = sides[1][1][state]
+    return states, expanded
+
+
+def alternatives(traversable, start, direction, goal, avoid=(), k=2, max_overlap=0.5, stretch=1.5,
+                 forward_cost=FORWARD_COST, turn_cost=TURN_COST):
+    """
+    Diverse near-optimal paths from the start pose to the goal cell, by the penalty method:
+    every path found makes its cells more expensive for the following searches.
+
+    Args:
+        avoid: List
+            Cells of paths already known (such as the fastest path) to share little with
+        k: int
+            Number of alternatives wanted
+        max_overlap: float
+            Largest share of the cells of an alternative that may lie on another kept path
+        stretch: float
+            Largest ratio between the cost of an alternative and the cheapest path
+
+    Returns:
+        List of (cost, states) ranked by cost, at most k of them
+    """
+    goal = (int(goal[0]), int(goal[1]))
+    kept_cells = []
+    penalty = dict()
+
+    def penalise(cells):
+        for cell in cells:
+            penalty[cell] = penalty.get(cell, 0) + forward_cost
+
+    if len(avoid):
+        kept_cells.append(set((int(r), int(c)) for r, c in avoid))
+        penalise(kept_cells[-1])
+    try:
+        states, _ = astar(traversable, start, direction, goal, forward_cost, turn_cost)
+    except ValueError:
+        return []
+    best = path_cost(states, forward_cost, turn_cost)
+    found = []
+    # each search either yields an alternative or pushes the next one further away
+    for _ in range(3 * k):
+        states, _ = astar(traversable, start, direction, goal, forward_cost, turn_cost, penalty)
+        cost = path_cost(states, forward_cost, turn_cost)
+        if cost > stretch * best:
+            break
+        cells = set(state[:2] for state in states)
+        if all(len(cells & other) <= max_overlap * len(cells) for other in kept_cells):
+            found.append((cost, states))
+            kept_cells.append(cells)
+            if len(found) == k:
+                break
+        penalise(cells)
+    return sorted(found, key=lambda alternative: alternative[0])
+
+
+def dijkstra(traversable, start, direction, forward_cost=FORWARD_COST, turn_cost=TURN_COST):
+    """
+    Costs from the start pose to every reachable pose
+
+    Returns:
+        (dist, parent): dicts keyed by (row, col, heading)
+    """
+    start = (int(start[0]), int(start[1]), direction)
+    dist = {start: 0}
+    parent = {start: None}
+    closed = set()
+    frontier = [(0, start)]
+    while frontier:
+        d, state = heapq.heappop(frontier)
+        if state in closed:
+            continue
+        closed.add(state)
+        for nxt, cost, _ in successors(traversable, state, forward_cost, turn_cost):
+            new_d = d + cost
+            if new_d < dist.get(nxt, float('inf')):
+                dist[nxt] = new_d
+                parent[nxt] = state
+                heapq.heappush(frontier, (new_d, nxt))
+    return dist, parent
+
+
+def nearest(traversable, start, direction, goals, forward_cost=FORWARD_COST, turn_cost=TURN_COST):
+    """
+    Cheapest of several goals from the start pose, found by a single uniform-cost search
+
+    Args:
+        goals: List
+            Candidate goals, either (row, col) reached with any heading or (row, col, heading)
+
+    Returns:
+        (index, states, expanded): the index in goals of the cheapest reachable goal, the poses
+        from start to it and the number of expanded states. index and states are None if no
+        goal can be reached
+    """
+    # goal index by pose and by cell, the first listed goal wins on equal cost
+    goal_poses = dict()
+    goal_cells = dict()
+    for i, goal in enumerate(goals):
+        key = tuple(int(x) for x in goal)
+        target = goal_poses if len(key) == 3 else goal_cells
+        target.setdefault(key, i)
+    start = (int(start[0]), int(start[1]), direction)
+    dist = {start: 0}
+    parent = {start: None}
+    closed = set()
+    frontier = [(0, start)]
+    while frontier:
+        d, state = heapq.heappop(frontier)
+        if state in closed:
+            continue
+        matches = [i for i in (goal_poses.get(state), goal_cells.get(state[:2])) if i is not None]
+        if matches:
+            return min(matches), trace(parent, state), len(closed)
+        closed.add(state)
+        for nxt, cost, _ in successors(traversable, state, forward_cost, turn_cost):
+            new_d = d + cost
+            if new_d < dist.get(nxt, float('inf')):
+                dist[nxt] = new_d
+                parent[nxt] = state
+                heapq.heappush(frontier, (new_d, nxt))
+    return None, None, len(closed)
+
+
+def search_from(traversable, start, direction):
+    """
+    dijkstra() from the pose, cached on the traversability layer until the map changes
+    """
+    key = ('dijkstra', int(start[0]), int(start[1]), direction)
+    return traversable.cached(key, lambda: dijkstra(traversable, start, direction))
+
+
+def trace(parent, state):
+    """
+    Follow parent links back from state
+
+    Returns:
+        List of states from the search root to state
+    """
+    states = []
+    while state:
+        states.append(state)
+        state = parent[state]
+    return states[::-1]
+
+
+def route(traversable, points, direction):
+    """
+    Cheapest route visiting the points in order, starting with the given direction.
+
+    The headings at every intermediate point are optimised jointly: each leg is searched
+    from every heading the robot could arrive with, and the cheapest combination is kept.
+
+    Args:
+        traversable: TraversableMap
+        points: List
+            Coordinates of the start, the waypoints and the goal
+        direction: int
+            The starting direction of the robot
+
+    Returns:
+        List of (row, col, heading) from the start to the goal
+
+    Raises:
+        ValueError if a point cannot be reached
+    """
+    points = [(int(p[0]), int(p[1])) for p in points]
+    # best[heading] = (cost, heading at the previous point) for every leg
+    best = [{direction: (0, None)}]
+    for src, dst in zip(points, points[1:]):
+        arrival = dict()
+        for heading, (cost, _) in best[-1].items():
+            dist, _ = search_from(traversable, src, heading)
+            for d in (NORTH, EAST, SOUTH, WEST):
+                leg = dist.get((dst[0], dst[1], d))
+                if leg is not None and cost + leg < arrival.get(d, (float('inf'),))[0]:
+                    arrival[d] = (cost + leg, heading)
+        if not arrival:
+            raise ValueError('No Path Found')
+        best.append(arrival)
+    # walk back through the legs to recover the headings at every point
+    heading = min(best[-1], key=lambda d: best[-1][d][0])
+    states = []
+    for i in range(len(points) - 1, 0, -1):
+        prev_heading = best[i][heading][1]
+        _, parent = search_from(traversable, points[i-1], prev_heading)
+        leg = trace(parent, (points[i][0], points[i][1], heading))
+        states = leg[:-1] + states if states else leg
+        heading = prev_heading
+    return states
+
+
+def path_cost(states, forward_cost=FORWARD_COST, turn_cost=TURN_COST):
+    """
+    Cost of a sequence of poses where consecutive poses differ by one movement
+    """
+    cost = 0
+    for prev, cur in zip(states, states[1:]):
+        cost += forward_cost if prev[:2] != cur[:2] else turn_cost
+    return cost
+
+
+def movements(states):
+    """
+    Convert a sequence of poses into the movements between them
+    """
+    moves = []
+    for prev, cur in zip(states, states[1:]):
+        if prev[:2] != cur[:2]:
+            moves.append(FORWARD)
+        elif cur[2] == turn_left(prev[2]):
+            moves.append(LEFT)
+        else:
+            moves.append(RIGHT)
+    return moves
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""Traversability layer of a map for the 3x3 robot footprint
+"""
+import numpy as np
+
+from algo.geometry import FOOTPRINT
+
+
+def flood(mask, cell):
+    """
+    Cells of mask connected to cell through side-by-side cells of mask, as a mask. The robot
+    can turn on the spot wherever it stands, so these are the centres it can drive to from cell
+    """
+    flooded = np.zeros_like(mask)
+    if not mask[tuple(cell)]:
+        return flooded
+    flooded[tuple(cell)] = True
+    while True:
+        grown = flooded.copy()
+        grown[1:] |= flooded[:-1]
+        grown[:-1] |= flooded[1:]
+        grown[:, 1:] |= flooded[:, :-1]
+        grown[:, :-1] |= flooded[:, 1:]
+        grown &= mask
+        if np.array_equal(grown, flooded):
+            return flooded
+        flooded = grown
+
+
+class TraversableMap:
+
+    """
+    Precomputed answer to "can the 3x3 robot stand centred on this cell" for every cell of a map.
+
+    The mask is computed for the whole grid in one vectorized pass. When the map changes,
+    refresh() diffs it against the last seen snapshot and only recomputes the centres whose
+    footprint covers a changed cell.
+
+    Attributes:
+        map_: np array
+            The map the layer follows (referenced, not copied)
+        snapshot: np array
+            Copy of the map as of the last refresh
+        mask: np array of bool
+            mask[r, c] is True if the 3x3 neighbourhood of (r, c) is inside the walls and has value 1
+        version: int
+            Incremented every time the mask changes
+        cache: dict
+            Results derived from the mask, dropped whenever the mask changes
+        fields: dict
+            Distance fields keyed by target cell, see algo.distfield
+        hierarchies: dict
+            Hierarchical planners keyed by cluster size, see algo.hierarchical
+    """
+
+    def __init__(self, map_):
+        """
+        Constructor
+
+        Args:
+            map_: np array
+                The map (0 unexplored, 1 free, 2 obstacle)
+        """
+        self.map_ = map_
+        self.snapshot = map_.copy()
+        self.mask = self.compute_mask(map_)
+        self.version = 0
+        self.cache = dict()
+        self.cache_version = 0
+        self.fields = dict()
+        self.hierarchies = dict()
+
+    @property
+    def shape(self):
+        return self.mask.shape
+
+    @staticmethod
+    def compute_mask(map_):
+        """
+        Compute the traversability mask of the whole map in one pass
+        """
+        rows, cols = map_.shape
+        free = map_ == 1
+        mask = np.zeros((rows, cols), dtype=bool)
+        if rows < 3 or cols < 3:
+            return mask
+        inner = np.ones((rows-2, cols-2), dtype=bool)
+        for dr, dc in FOOTPRINT:
+            inner &= free[1+dr:rows-1+dr, 1+dc:cols-1+dc]
+        mask[1:-1, 1:-1] = inner
+        return mask
+
+    def refresh(self, map_=None):
+        """
+        Bring the mask up to date with the map.
+
+        Args:
+            map_: np array, optional
+                A new map to follow instead of the current one (must have the same shape)
+
+        Returns:
+            np array of flat indices whose traversability changed
+        """
+        if map_ is not None:
+            self.map_ = map_
+        changed = np.flatnonzero(self.map_ != self.snapshot)
+        if changed.size == 0:
+            return changed
+        self.snapshot.flat[changed] = self.map_.flat[changed]
+        return self.update(changed)
+
+    def update(self, cells):
+        """
+        Recompute the mask around the given map cells.
+
+        Args:
+            cells: np array
+                Flat indices of the map cells whose value changed
+
+        Returns:
+            np array of flat indices whose traversability changed
+        """
+        rows, cols = self.shape
+        r, c = np.divmod(np.asarray(cells, dtype=int), cols)
+        # every centre whose footprint covers a changed cell
+        offsets = np.arange(-1, 2)
+        rr = (r[:, None, None] + offsets[None, :, None]).repeat(3, axis=2).ravel()
+        cc = (c[:, None, None] + offsets[None, None, :]).repeat(3, axis=1).ravel()
+        inside = (rr >= 1) & (rr < rows-1) & (cc >= 1) & (cc < cols-1)
+        centres = np.unique(rr[inside] * cols + cc[inside])
+        if centres.size == 0:
+            return centres
+        r, c = np.divmod(centres, cols)
+        free = self.map_ == 1
+        valid = np.ones(centres.size, dtype=bool)
+        for dr, dc in FOOTPRINT:
+            valid &= free[r+dr, c+dc]
+        flipped = centres[self.mask.flat[centres] != valid]
+        if flipped.size:
+            self.mask.flat[flipped] = ~self.mask.flat[flipped]
+            self.version += 1
+        return flipped
+
+    def cached(self, key, build):
+        """
+        Return build() memoized under key until the mask changes
+        """
+        if self.cache_version != self.version:
+            self.cache.clear()
+            self.cache_version = self.version
+        if key not in self.cache:
+            self.cache[key] = build()
+        return self.cache[key]
+
+    def region(self, cell):
+        """
+        Mask of the centres the robot can drive to from cell, memoized until the mask changes
+        """
+        cell = (int(cell[0]), int(cell[1]))
+        return self.cached(('region', cell), lambda: flood(self.mask, cell))
+
+    def check_valid(self, coord):
+        """
+        Check if the robot can stand centred on the given coordinate
+        """
+        r, c = coord
+        rows, cols = self.mask.shape
+        return 0 <= r < rows and 0 <= c < cols and bool(self.mask[r, c])
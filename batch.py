@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Explore many arenas headlessly in parallel and tabulate the results
+
+Usage:
+    python batch.py [map/*.txt ...] [--workers 8] [--time-limit 360] [--strategy neighbours]
+                    [--output results.csv]
+"""
+import argparse
+import contextlib
+import csv
+import glob
+import multiprocessing
+import os
+import signal
+import sys
+import time
+
+from algo.constants import EXPLORE_NEIGHBOURS, EXPLORE_FRONTIER, LEFT, RIGHT, MOTION_PROFILE_FILE
+from algo.costmodel import MotionProfile
+from algo.mapmethod import map_from_file, start_of
+from algo.simulator import Simulator, TimingModel, MOTION
+
+COLUMNS = ('map', 'coverage', 'moves', 'turns', 'seconds', 'home', 'late', 'error', 'wall')
+
+
+def alarm(signum, frame):
+    raise TimeoutError('no result after the wall-clock timeout')
+
+
+def explore_map(path, time_limit, strategy, profile, timeout):
+    """
+    Simulate the exploration of one arena
+
+    Returns:
+        dict with a value for each of COLUMNS
+    """
+    row = dict.fromkeys(COLUMNS, '')
+    row['map'] = path
+    t = time.perf_counter()
+    if timeout:
+        signal.signal(signal.SIGALRM, alarm)
+        signal.alarm(timeout)
+    try:
+        arena = map_from_file(path)
+        simulator = Simulator(arena, TimingModel(profile))
+        exploration = simulator.explore(time_limit, strategy=strategy)
+        robot = exploration.robot
+        movements = ''.join(detail for _, _, kind, detail in simulator.log if kind == MOTION)
+        row.update(coverage='{:.4f}'.format(robot.compute_coverage()),
+                   moves=len(movements),
+                   turns=movements.count(LEFT) + movements.count(RIGHT),
+                   seconds='{:.2f}'.format(simulator.clock.time()),
+                   home=int(tuple(robot.center) == tuple(start_of(arena.shape))),
+                   # back after the time limit
+                   late=int(bool(time_limit) and simulator.clock.time() > time_limit))
+    except Exception as e:
+        row['error'] = '{}: {}'.format(type(e).__name__, e)
+    finally:
+        if timeout:
+            signal.alarm(0)
+    row['wall'] = '{:.3f}'.format(time.perf_counter() - t)
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('maps', nargs='*', default=[os.path.join('map', '*.txt')],
+                        help='map files or glob patterns')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--time-limit', type=float, default=360,
+                        help='seconds of the exploration and the return, 0 for none')
+    # neighbours was tuned on the stock maps, frontier covers generated arenas far better
+    parser.add_argument('--strategy', choices=(EXPLORE_NEIGHBOURS, EXPLORE_FRONTIER), default=EXPLORE_FRONTIER)
+    parser.add_argument('--profile', default=MOTION_PROFILE_FILE)
+    parser.add_argument('--timeout', type=int, default=60,
+                        help='wall-clock seconds after which a map is given up, 0 for none')
+    parser.add_argument('--output', default=None, help='CSV file, standard output if not given')
+    args = parser.parse_args()
+
+    paths = sorted({path for pattern in args.maps for path in glob.glob(pattern)})
+    if not paths:
+        parser.error('no map found')
+    profile = MotionProfile.load(args.profile) if os.path.exists(args.profile) else MotionProfile()
+    jobs = [(path, args.time_limit or None, args.strategy, profile, args.timeout) for path in paths]
+
+    t = time.perf_counter()
+    with multiprocessing.Pool(args.workers) as pool:
+        rows = pool.starmap(explore_map, jobs, chunksize=1)
+
+    with (open(args.output, 'w', newline='') if args.output else contextlib.nullcontext(sys.stdout)) as f:
+        writer = csv.DictWriter(f, COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    done = [row for row in rows if not row['error']]
+    print('{} maps, {} failed, {} not home, {} late, mean coverage {:.4f}, {:.1f} s'.format(
+        len(rows), len(rows) - len(done), sum(1 for row in done if not row['home']),
+        sum(1 for row in done if row['late']),
+        sum(float(row['coverage']) for row in done) / max(len(done), 1),
+        time.perf_counter() - t), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""Planning and exploration latency on arenas of increasing size
+
+Usage:
+    python benchmark.py [--sizes 20x15 100x100 500x500] [--repeat 3] [--seed 0]
+"""
+import argparse
+import glob
+import os
+import time
+
+from algo.constants import NORTH, PLAN_CELL, PLAN_HEADING, PLAN_FIELD, PLAN_HIERARCHICAL, PLAN_JPS, \
+    PLAN_ANYTIME, PLAN_BIDIRECTIONAL
+from algo.mapmethod import start_of, goal_of, map_from_file
+from algo.traversable import TraversableMap
+from algo.fastest import FastestPath
+from algo.dstar import DStarLite
+from algo.robot import SimuRobot
+from algo.exploration import Exploration
+from algo.sensing import information_gain
+from algo.arena import generate, reachable
+
+
+def timed(func, repeat):
+    """
+    Best wall-clock time of func() over repeat calls, in milliseconds
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        t = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - t)
+    return best * 1000
+
+
+def bench_planning(arena, repeat):
+    shape = arena.shape
+    start, goal = start_of(shape), goal_of(shape)
+    traversable = TraversableMap(arena)
+    results = dict()
+    results['mask build'] = timed(lambda: TraversableMap(arena), repeat)
+
+    # toggle a short wall near the middle of the arena (obstacles and free cells swap),
+    # where the goal stays reachable either way
+    def toggled(wall):
+        changed = arena.copy()
+        changed[wall] = 3 - changed[wall]
+        return changed
+    rows = sorted(range(shape[0]), key=lambda r: abs(r - shape[0]//2))
+    wall = next((wall for wall in ((r, slice(0, 10)) for r in rows)
+                 if reachable(toggled(wall), start, goal)), (shape[0]//2, slice(0, 0)))
+    original = arena[wall].copy()
+    def refresh():
+        arena[wall] = 3 - arena[wall]
+        traversable.refresh()
+    results['mask refresh'] = timed(refresh, repeat)
+    arena[wall] = original
+    traversable.refresh()
+
+    def refresh_and(func):
+        def both():
+            refresh()
+            func()
+        return both
+
+    for name, mode in (('astar cell', PLAN_CELL), ('astar heading', PLAN_HEADING),
+                       ('bidirectional', PLAN_BIDIRECTIONAL)):
+        fsp = FastestPath(arena, start, goal, NORTH, traversable=traversable, mode=mode)
+        results[name] = timed(fsp.run, repeat)
+    # a deadline already passed: only the first, inflated search
+    fsp = FastestPath(arena, start, goal, NORTH, traversable=traversable, mode=PLAN_ANYTIME, deadline=0)
+    results['anytime first'] = timed(fsp.run, repeat)
+    # the nearest of a few cells below and left of the goal zone, in one search
+    candidates = [(goal[0]+i, goal[1]-j) for i in (0, 3, 6) for j in (0, 3, 6)]
+    fsp = FastestPath(arena, start, goal, NORTH, traversable=traversable)
+    results['nearest'] = timed(lambda: fsp.run_nearest(candidates), repeat)
+
+    traversable.fields.clear()
+    t = time.perf_counter()
+    FastestPath(arena, start, goal, NORTH, traversable=traversable, mode=PLAN_FIELD).run()
+    results['field build'] = (time.perf_counter() - t) * 1000
+    fsp = FastestPath(arena, start, goal, NORTH, traversable=traversable, mode=PLAN_FIELD)
+    results['field query'] = timed(fsp.run, repeat)
+
+    traversable.hierarchies.clear()
+    t = time.perf_counter()
+    FastestPath(arena, start, goal, NORTH, traversable=traversable, mode=PLAN_HIERARCHICAL).run()
+    results['hpa build'] = (time.perf_counter() - t) * 1000
+    fsp = FastestPath(arena, start, goal, NORTH, traversable=traversable, mode=PLAN_HIERARCHICAL)
+    results['hpa query'] = timed(fsp.run, repeat)
+    # a local change only rebuilds the clusters it touches
+    results['hpa replan'] = timed(refresh_and(fsp.run), repeat)
+    arena[wall] = original
+    traversable.refresh()
+    return results
+
+
+def bench_expansion(arena):
+    """
+    Nodes expanded by the searches from the start zone to the goal zone, None if there
+    is no path
+    """
+    shape = arena.shape
+    traversable = TraversableMap(arena)
+    results = dict()
+    for name, mode in (('cell', PLAN_CELL), ('jps', PLAN_JPS), ('heading', PLAN_HEADING),
+                       ('bidirectional', PLAN_BIDIRECTIONAL)):
+        fsp = FastestPath(arena, start_of(shape), goal_of(shape), NORTH,
+                          traversable=traversable, mode=mode)
+        try:
+            fsp.run()
+            results[name] = fsp.expanded
+        except ValueError:
+            results[name] = None
+    return results
+
+
+def bench_exploration(arena, repeat, steps=50):
+    shape = arena.shape
+    robot = SimuRobot(NORTH, start_of(shape), arena, lambda *args: None)
+    exploration = Exploration(robot)
+    # the non-I/O part of an exploration step: sense, refresh the mask and decide
+    def step():
+        robot.update_map()
+        robot.traversable.refresh()
+        for direction in ('LEFT', 'FRONT', 'RIGHT'):
+            exploration.direction_clear(direction)
+        exploration.check_completed()
+        robot.compute_coverage()
+    results = dict()
+    results['explore step'] = timed(step, repeat * steps)
+    results['info gain'] = timed(
+        lambda: information_gain(robot.current_map, robot.traversable.mask), repeat * steps)
+
+    r, c = robot.center
+    candidates = [(r-i, c+j) for i in (2, 3) for j in (-1, 0, 1)] + \
+        [(r+j, c+i) for i in (2, 3) for j in (-1, 0, 1)]
+    planner = DStarLite(robot.traversable, candidates)
+    t = time.perf_counter()
+    exploration.plan_nearest(planner)
+    results['frontier plan'] = (time.perf_counter() - t) * 1000
+    # repair after newly sensed cells
+    robot.current_map[r-6:r-3, c-1:c+2] = 1
+    results['frontier replan'] = timed(lambda: exploration.plan_nearest(planner), 1)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', default=['20x15', '100x100', '250x250', '500x500'])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rows = []
+    expansions = []
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(__file__) or '.', 'map', '*.txt'))):
+        expansions.append((os.path.basename(path), bench_expansion(map_from_file(path))))
+    for size in args.sizes:
+        r, c = map(int, size.lower().split('x'))
+        arena = generate(r, c, 0.05, seed=args.seed)
+        results = bench_planning(arena, args.repeat)
+        results.update(bench_exploration(arena, args.repeat))
+        expansions.append((size, bench_expansion(arena)))
+        # open floor, where jumping pays off the most
+        expansions.append((size + ' open', bench_expansion(generate(r, c, 0.005, seed=args.seed))))
+        rows.append((size, results))
+
+    names = list(rows[0][1])
+    print('{:>10}'.format('ms') + ''.join('{:>16}'.format(name) for name in names))
+    for size, results in rows:
+        print('{:>10}'.format(size) + ''.join('{:>16.3f}'.format(results[name]) for name in names))
+
+    print()
+    modes = list(expansions[0][1])
+    print('{:>16}'.format('expanded') + ''.join('{:>16}'.format(mode) for mode in modes))
+    for name, results in expansions:
+        print('{:>16}'.format(name) + ''.join('{:>16}'.format(str(results[mode])) for mode in modes))
+
+
+if __name__ == '__main__':
+    main()
@@ -13,6 +13,9 @@ import sys
 import json
 from algo.constants import *
 from algo.mapmethod import map_from_file
+from algo.movement import encode
+from algo.costmodel import MotionProfile
+from algo.traversable import TraversableMap
 from algo.robot import *
 from threading import Thread
 import generate
@@ -227,6 +230,14 @@ class RPi:
         self.waypoint = np.array([])
         self.wp = False
         self.counter = 0
+        self.traversable = None
+        # the last fastest path planned, with its alternatives
+        self.fsp = None
+        # measured motion profile of the robot, the default one until it is calibrated
+        if os.path.exists(MOTION_PROFILE_FILE):
+            self.profile = MotionProfile.load(MOTION_PROFILE_FILE)
+        else:
+            self.profile = MotionProfile()
         print(f'[CONNECT] connect to RPi on {ADDR}')
 
     def keep_main(self):
@@ -255,21 +266,7 @@ class RPi:
         #     return
 
         if msg != 'E' and msg != 'C':
-            encode_s = ''
-            countF = 0
-            i = 0
-            while i < len(msg):
-                if msg[i] == 'F':
-                    countF = 1
-                    i += 1
-                    while i < len(msg) and msg[i] == 'F':
-                        countF += 1
-                        i += 1
-                    encode_s += 'F'+str(countF)
-                else:
-                    encode_s += msg[i]
-                    i += 1
-            msg = encode_s
+            msg = encode(msg)
         msg = '[a]' + msg + c + '\0'
         message = msg.encode(FORMAT)
         self.client.send(message)
@@ -304,9 +301,13 @@ class RPi:
 
                 print(f"start point:{split_data[1]}, {split_data[2]}")
 
+                # 'StartPoint r c frontier' opts in to frontier exploration
+                strategy = split_data[3] if len(split_data) > 3 else EXPLORE_NEIGHBOURS
+                print(f"strategy:{strategy}")
+
                 robot = RealRobot(NORTH, start, self.send,
                                   self.receive, update_frontend)
-                exp = Exploration(robot)
+                exp = Exploration(robot, profile=self.profile, strategy=strategy)
                 exp.start()
             elif (split_data[0] == 'WayPoint'):
                 self.waypoint = np.asarray(
@@ -318,34 +319,26 @@ class RPi:
                 update_frontend(current_map, START,
                                 self.cal_head(START, NORTH))
                 print('Starting FSP')
-                # if waypoint.any():
-                #     fsp = FastestPath(simu_map, START, GOAL, waypoint)
-                # else:
                 print(self.waypoint)
+                if self.traversable is None:
+                    self.traversable = TraversableMap(current_map)
+                else:
+                    self.traversable.refresh(current_map)
                 if(self.wp):
-                    fsp = FastestPath(current_map, START, self.waypoint, NORTH)
-                    fsp.run()
-                    c_d = fsp.center_directions
-                    movements = fsp.movements
-                    new_direction = fsp.direction
-                    print(f'Detect Direction {new_direction}')
-                    print(new_direction)
-                    fsp = FastestPath(
-                        current_map, self.waypoint, GOAL, new_direction)
-                    fsp.run()
-                    c_d.extend(fsp.center_directions)
-                    movements.extend(fsp.movements)
-                    self.send(movements)
-                    self.FSPmovement(c_d, current_map)
+                    fsp = FastestPath(current_map, START, GOAL, NORTH, waypoint=self.waypoint,
+                                      traversable=self.traversable)
                     print("wp")
                 else:
-                    fsp = FastestPath(current_map, START, GOAL, NORTH)
-                    fsp.run()
-                    c_d = fsp.center_directions
-                    movements = fsp.movements
-                    self.send(movements)
-                    self.FSPmovement(c_d, current_map)
+                    # alternatives are kept ready in case a cell on the way turns out blocked
+                    fsp = FastestPath(current_map, START, GOAL, NORTH, traversable=self.traversable,
+                                      mode=PLAN_TIMED, profile=self.profile, n_alternatives=2)
                     print("no wp")
+                fsp.run()
+                self.fsp = fsp
+                c_d = fsp.center_directions
+                movements = fsp.movements
+                self.send(movements)
+                self.FSPmovement(c_d, current_map)
 
     def FSPmovement(self, c_ds, map_):
         init_center, init_direction = START, NORTH
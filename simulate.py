@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""Predict how long exploration and fastest path take on the robot, and where the time goes
+
+Usage:
+    python simulate.py map/sample1.txt [--time-limit 360] [--strategy frontier]
+                       [--profile map/profile.json] [--sense-time 0.2] [--latency 0.05]
+"""
+import argparse
+import os
+
+from algo.constants import EXPLORE_NEIGHBOURS, EXPLORE_FRONTIER, PLAN_MODES, PLAN_CELL, \
+    MOTION_PROFILE_FILE
+from algo.costmodel import MotionProfile
+from algo.mapmethod import map_from_file
+from algo.simulator import Simulator, TimingModel, KINDS
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('map')
+    parser.add_argument('--time-limit', type=float, default=None)
+    parser.add_argument('--coverage', type=float, default=None)
+    parser.add_argument('--strategy', choices=(EXPLORE_NEIGHBOURS, EXPLORE_FRONTIER), default=EXPLORE_NEIGHBOURS)
+    parser.add_argument('--mode', choices=PLAN_MODES, default=PLAN_CELL)
+    parser.add_argument('--profile', default=MOTION_PROFILE_FILE)
+    parser.add_argument('--sense-time', type=float, default=0.2)
+    parser.add_argument('--latency', type=float, default=0.05)
+    args = parser.parse_args()
+
+    profile = MotionProfile.load(args.profile) if os.path.exists(args.profile) else MotionProfile()
+    timing = TimingModel(profile, args.sense_time, args.latency)
+    arena = map_from_file(args.map)
+
+    rows = []
+    explore = Simulator(arena, timing)
+    exploration = explore.explore(args.time_limit, args.coverage, args.strategy)
+    rows.append(('exploration', explore.report()))
+    fastest = Simulator(arena, timing)
+    fastest.fastest(mode=args.mode)
+    rows.append(('fastest path', fastest.report()))
+
+    names = KINDS + ('total',)
+    print('{:>14}'.format('s') + ''.join('{:>10}'.format(name) for name in names))
+    for name, spent in rows:
+        print('{:>14}'.format(name) + ''.join('{:>10.2f}'.format(spent[kind]) for kind in names))
+    print('coverage {:.2f}'.format(exploration.robot.compute_coverage()))
+
+
+if __name__ == '__main__':
+    main()